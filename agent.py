@@ -14,14 +14,186 @@ This module codes the random-decision-making agents which traverse the ladder.
 """
 
 import numpy as np
+import json
 import time
 
+################################################################################
+# random numbers for the agents
+################################################################################
+
+# bit generators that can be picked by name. PCG64 is numpy's default, SFC64 is
+# usually the fastest, Philox is counter based
+BITGENS = ("PCG64", "PCG64DXSM", "SFC64", "Philox", "MT19937");
+
+def Generator(seed = None, bitgen = "PCG64"):
+    """
+    Make a np.random.Generator from a seed, with a choice of bit generator
+    
+    Args:
+    seed, optional, None (fresh entropy), int, np.random.SeedSequence, or an
+        existing np.random.Generator, which is returned as is
+    bitgen, optional, string, name of bit generator, one of BITGENS
+    
+    Returns np.random.Generator
+    """
+    
+    if( isinstance(seed, np.random.Generator) ):
+        return seed;
+    if( bitgen not in BITGENS ):
+        raise ValueError("bit generator must be one of "+str(BITGENS)+", not "+str(bitgen) );
+    if( not isinstance(seed, np.random.SeedSequence) ):
+        seed = np.random.SeedSequence(seed);
+        
+    return np.random.Generator(getattr(np.random, bitgen)(seed) ); #### end generator
+    
+def Substreams(seed, n, bitgen = "PCG64"):
+    """
+    Independent, reproducible random streams for replicas or workers, spawned
+    from one seed with np.random.SeedSequence.spawn. Stream i only depends on
+    seed and i, so results don't depend on how the streams are handed out.
+    
+    Args:
+    seed, None, int or np.random.SeedSequence, master seed
+    n, int, number of streams
+    bitgen, optional, string, name of bit generator, one of BITGENS
+    
+    Returns list of n np.random.Generator objects
+    """
+    
+    if( not isinstance(seed, np.random.SeedSequence) ):
+        seed = np.random.SeedSequence(seed);
+        
+    return [Generator(child, bitgen) for child in seed.spawn(n)]; #### end substreams
+
+class randomblock(object):
+    """
+    Source of uniform random numbers for agent decisions. Calling np.random for
+    one number at a time is slow, so the numbers are drawn from a seeded
+    np.random.Generator in large blocks and handed out one by one, with a new
+    block drawn whenever the old one runs out.
+    """
+    
+    #### overloaded operators
+    
+    def __init__(self, seed = None, size = 2**16, bitgen = "PCG64"):
+        """
+        Args:
+        seed, optional, None (fresh entropy), int, np.random.SeedSequence or
+            np.random.Generator, see Generator
+        size, optional, int, how many numbers to draw at a time
+        bitgen, optional, string, name of bit generator, one of BITGENS
+        """
+        
+        self.gen = Generator(seed, bitgen);
+        self.seq = self.gen.bit_generator.seed_seq; # spawns child streams
+        self.size = size;
+        self.block = []; # current block of numbers, as python floats
+        self.i = 0; # index of next number to hand out
+        
+        #### end init
+        
+    #### drawing numbers
+        
+    def uniform(self):
+        """
+        Returns float, next uniform random number in [0, 1)
+        """
+        
+        # draw a new block if this one is used up
+        if( self.i == len(self.block) ):
+            self.block = self.gen.random(self.size).tolist();
+            self.i = 0;
+            
+        self.i += 1;
+        return self.block[self.i - 1]; #### end uniform
+        
+    def Seed(self, seed = None, bitgen = "PCG64"):
+        """
+        Restart the stream from a new seed, throwing away the current block
+        """
+        
+        self.gen = Generator(seed, bitgen);
+        self.seq = self.gen.bit_generator.seed_seq;
+        self.block = [];
+        self.i = 0;
+        
+        #### end seed
+        
+    def Spawn(self, n):
+        """
+        Make n independent child streams of this one, with the same block size
+        and bit generator, eg one for each worker. Raises ValueError if the seed
+        sequence is unknown, eg the state was restored from a save without it
+        
+        Returns list of randomblock objects
+        """
+        
+        if( not isinstance(self.seq, np.random.SeedSequence) ):
+            raise ValueError("Cannot spawn streams : the seed sequence of this stream is unknown");
+        bitgen = type(self.gen.bit_generator).__name__;
+        seeds = self.seq.spawn(n);
+        
+        return [randomblock(child, self.size, bitgen) for child in seeds]; #### end spawn
+        
+    #### saving and loading the stream
+        
+    def GetState(self):
+        """
+        Returns tuple of (string, 1d np array), the generator state and seed
+        sequence as json and the numbers left in the current block
+        """
+        
+        # some bit generators keep part of their state in arrays
+        def Encode(x):
+            return {"array": x.tolist(), "dtype": str(x.dtype)};
+            
+        # seed sequence, so streams spawned after loading are the same
+        state = dict(self.gen.bit_generator.state);
+        if( isinstance(self.seq, np.random.SeedSequence) ):
+            state["seed_seq"] = {"entropy": self.seq.entropy, "spawn_key": list(self.seq.spawn_key),
+                "pool_size": self.seq.pool_size, "n_children_spawned": self.seq.n_children_spawned};
+            
+        return json.dumps(state, default = Encode), np.array(self.block[self.i:]);
+        
+    def SetState(self, state, block):
+        """
+        Restore the stream to a state returned by GetState
+        """
+        
+        def Decode(d):
+            if( "array" in d ):
+                return np.array(d["array"], dtype = d["dtype"]);
+            return d;
+            
+        state = json.loads(state, object_hook = Decode);
+        seq = state.pop("seed_seq", None); # missing from older saves
+        if( seq is not None ):
+            seq = np.random.SeedSequence(seq["entropy"], spawn_key = tuple(seq["spawn_key"]),
+                pool_size = seq["pool_size"], n_children_spawned = seq["n_children_spawned"]);
+        bitgen = getattr(np.random, state["bit_generator"])(seq);
+        bitgen.state = state;
+        self.gen = np.random.Generator(bitgen);
+        self.seq = seq;
+        self.block = list(block.tolist() );
+        self.i = 0;
+        
+        #### end set state
+        
+    #### end randomblock
+    
+    
+# stream used by any agent that isn't handed one, seed with RNG.Seed()
+RNG = randomblock();
+
 ################################################################################
 # define the agent class
 ################################################################################
 
 class agent(object):
 
+    # fixed attributes, so agents don't each carry a __dict__
+    __slots__ = ("stay", "up", "name", "flag");
+
     #### overloaded operators
 
     def __init__(self, prob_stay, prob_up, name="0"):
@@ -77,15 +249,18 @@ class agent(object):
         
     #### choice scenarios of the agent
     
-    def OnRung(self):
+    def OnRung(self, rng = None):
         """
         1st choice scenario: agent reaches rung, it decides whether to stay, leave
         
+        Args:
+        rng, optional, randomblock to draw from, defaults to agent.RNG
+        
         Returns bool, True if stay, False if leave
         """
         
         # generate random val
-        alpha = np.random.uniform();
+        alpha = (rng or RNG).uniform();
         
         # choose based on prob
         if(alpha < self.stay):
@@ -95,16 +270,19 @@ class agent(object):
             
         #### end OnRung
     
-    def OnLadder(self):
+    def OnLadder(self, rng = None):
         """
         2nd choice scenario: when the agent has left a rung, it will
         decide whether to go up or down the ladder.
         
+        Args:
+        rng, optional, randomblock to draw from, defaults to agent.RNG
+        
         Returns bool, True if up, False if down
         """
         
         # generate random val
-        alpha = np.random.uniform();
+        alpha = (rng or RNG).uniform();
         
         # choose based on prob
         if(alpha < self.up):
@@ -116,7 +294,7 @@ class agent(object):
         
     #### overall action of the agent in one time step
     
-    def Act(self):
+    def Act(self, rng = None):
         """
         In a single time step, the agent can either move one rung up, one down, or stay
         put. These options are expressed as return values 1, -1, 0. Each time step,
@@ -124,17 +302,23 @@ class agent(object):
         leave. If it leaves, it is on the ladder, and will choose to go up (return 1) or
         down (return -1).
         
+        Args:
+        rng, optional, randomblock to draw from, defaults to agent.RNG
+        
         Returns: int 1, -1, 0 as explained above
         """
         
+        # both choices draw from the same stream
+        rng = rng or RNG;
+        
         # first choice
-        if( self.OnRung() ): # true means it stays
+        if( self.OnRung(rng) ): # true means it stays
             return 0;
             
         else: # false means it leaves
         
             # second choice
-            if( self.OnLadder() ): # true means go up
+            if( self.OnLadder(rng) ): # true means go up
                 return 1;
                 
             else: # false means go down
@@ -143,6 +327,180 @@ class agent(object):
         #### end act
         
         
+################################################################################
+# compact population of agents
+################################################################################
+
+class population(object):
+    """
+    Many agents stored as columns: the stay and up probs and the flags are each a
+    1d np array, with one entry per agent. Names are kept in a side table only if
+    they are given. Indexing or iterating the population gives agentview objects,
+    which act just like agent objects but hold no data of their own.
+    """
+    
+    #### overloaded operators
+    
+    def __init__(self, N, prob_stay, prob_up, names = None):
+        """
+        Args:
+        N, int, number of agents
+        prob_stay, prob_up, doubles or 1d arrays of length N, choice probs of the
+            agents, see agent.__init__
+        names, optional, None (all agents named "0"), string shared by all agents,
+            or sequence of N strings
+        """
+        
+        # def probability attributes
+        self.stay = np.empty(N);
+        self.stay[:] = prob_stay;
+        self.up = np.empty(N);
+        self.up[:] = prob_up;
+        
+        # check reasonability of probabilites
+        if( N and (self.stay.max() > 1 or self.stay.min() < 0) ):
+            raise ValueError("Cannot init population : prob stay must be 0 < prob_stay < 1");
+            
+        elif( N and (self.up.max() > 1 or self.up.min() < 0) ):
+            raise ValueError("Cannot init population : prob up must be 0 < prob_up < 1");
+            
+        # other attributes
+        self.flag = np.zeros(N, dtype = bool);
+        if( names is None ):
+            names = "0";
+        elif( not isinstance(names, str) ):
+            names = list(names);
+            if( len(names) != N ):
+                raise ValueError("Cannot init population : need one name per agent");
+        self.names = names; # either one string for all or list of strings
+            
+        #### end init
+        
+    def __len__(self):
+    
+        return len(self.stay);
+        
+    def __getitem__(self, i):
+        """
+        Returns agentview of the ith agent
+        """
+        
+        if( i < 0 ):
+            i += len(self);
+        if( i < 0 or i >= len(self) ):
+            raise IndexError("Population index out of range");
+            
+        return agentview(self, i);
+        
+    def __iter__(self):
+    
+        return map(agentview, [self]*len(self), range(len(self)) );
+        
+    #### helpful methods
+        
+    def Name(self, i):
+        """
+        Name of the ith agent
+        """
+        
+        if( isinstance(self.names, str) ):
+            return self.names;
+        return self.names[i];
+        
+    def Rename(self, i, name):
+        """
+        Change the name of the ith agent
+        """
+        
+        # names shared by all agents have to be split out first
+        if( isinstance(self.names, str) ):
+            self.names = [self.names]*len(self);
+        self.names[i] = name;
+        
+        #### end rename
+        
+    def Views(self):
+        """
+        Returns list of agentview objects for every agent in the population
+        """
+        
+        return list(self); #### end views
+        
+        
+class agentview(object):
+    """
+    Lightweight stand in for an agent object that is really a row of a population.
+    Has the same attributes and choice methods as agent.
+    """
+    
+    __slots__ = ("pop", "i");
+    
+    #### overloaded operators
+    
+    def __init__(self, pop, i):
+        """
+        Args:
+        pop, population object the agent belongs to
+        i, int, index of the agent in the population
+        """
+        
+        self.pop = pop;
+        self.i = i;
+        
+        #### end init
+        
+    def __eq__(self, other):
+        """
+        Views are made fresh each time a population is indexed, so two views are
+        the same agent if they point at the same row of the same population
+        """
+        
+        if( not isinstance(other, agentview) ):
+            return NotImplemented;
+        return self.pop is other.pop and self.i == other.i; #### end eq
+        
+    def __hash__(self):
+    
+        return hash((id(self.pop), self.i) ); #### end hash
+        
+    __str__ = agent.__str__;
+    __repr__ = agent.__repr__;
+        
+    #### attributes, read from population
+    
+    @property
+    def stay(self):
+        return self.pop.stay[self.i];
+        
+    @property
+    def up(self):
+        return self.pop.up[self.i];
+        
+    @property
+    def name(self):
+        return self.pop.Name(self.i);
+        
+    @name.setter
+    def name(self, name):
+        self.pop.Rename(self.i, name);
+        
+    @property
+    def flag(self):
+        return self.pop.flag[self.i];
+        
+    @flag.setter
+    def flag(self, flag):
+        self.pop.flag[self.i] = flag;
+        
+    #### choice scenarios, same as agent
+    
+    OnRung = agent.OnRung;
+    OnLadder = agent.OnLadder;
+    Act = agent.Act;
+    
+    #### end agentview
+        
+        
 ################################################################################
 # helpful functions that go with agent class
 ################################################################################
@@ -170,6 +528,48 @@ def TestAgents(n):
         
     return ret; #### end Test Agents
     
+def Flatten(parts):
+    """
+    Collect agents from any nesting of iterables into one flat list, in order.
+    Walks the input with a stack of iterators rather than recursion, and checks
+    each leaf is an agent instead of relying on iteration failing.
+    
+    Args:
+    parts, single agent, agent.population, or any iterable of these (can be
+        higher dimension also)
+        
+    Returns list of agent or agentview objects
+    """
+    
+    kinds = (agent, agentview);
+    
+    # quick cases, no nesting
+    if( isinstance(parts, kinds) ):
+        return [parts];
+    elif( isinstance(parts, population) ):
+        return parts.Views();
+    elif( isinstance(parts, (list, tuple)) and all([isinstance(p, kinds) for p in parts]) ):
+        return list(parts);
+        
+    # general case, depth first over nested iterables
+    flat = [];
+    stack = [iter([parts])];
+    while stack:
+        for p in stack[-1]:
+            if( isinstance(p, kinds) ):
+                flat.append(p);
+            elif( isinstance(p, population) ):
+                flat.extend(p.Views() );
+            elif( isinstance(p, str) or not hasattr(p, "__iter__") ): # problem
+                raise ValueError("Expected agent or iterable of agents, got "+repr(p) );
+            else: # go one level deeper, come back to this level after
+                stack.append(iter(p) );
+                break;
+        else: # this level is used up
+            stack.pop();
+            
+    return flat; #### end flatten
+    
     
 
         
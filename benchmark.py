@@ -0,0 +1,267 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+benchmark.py:
+This module times the hot paths of the ladder and agent code, so that changes can
+be checked for speed regressions and the engines compared. Results are written as
+json, with throughputs in particle steps per second where that makes sense.
+
+usage: python benchmark.py [--max-particles N] [--out results.json]
+"""
+
+import agent
+import ladder
+import fastladder
+
+import numpy as np
+import argparse
+import json
+import platform
+import sys
+import time
+
+################################################################################
+# timing helpers
+################################################################################
+
+def Time(func, repeat = 3):
+    """
+    Best wall time of several calls to func, best rather than mean since noise only
+    ever makes things slower
+
+    Args:
+    func, function of no args to time
+    repeat, optional, int, number of calls
+
+    Returns double, seconds
+    """
+
+    best = float("inf");
+    for i in range(repeat):
+        t0 = time.perf_counter();
+        func();
+        best = min(best, time.perf_counter() - t0);
+
+    return best; #### end time
+
+def MakeLadder(engine, N, height, seed = 0):
+    """
+    Make a ladder of the given engine with N particles spread evenly over height
+    rungs, so that time steps can be timed at a chosen ladder height
+
+    Args:
+    engine, string, "ladder", "array" or "count"
+    N, int, number of particles
+    height, int, number of rungs
+    seed, optional, int, seed for the ladder's random stream
+
+    Returns ladder object of the given engine
+    """
+
+    levels = np.arange(N) % height; # rung of each particle
+    if( engine == "ladder" ):
+        lad = ladder.ladder(seed = seed);
+        for i in range(1, height):
+            lad.append(ladder.rung(lad.spec.Energy(i), []) );
+        views = agent.population(N, 0.5, 0.4).Views();
+        for i, r in enumerate(lad.nodes):
+            r.content.occupants = views[i::height];
+        lad.Recount();
+    elif( engine == "array" ):
+        lad = fastladder.arrayladder(seed = seed);
+        lad.Start(agent.population(N, 0.5, 0.4) );
+        lad.rungs = levels;
+        lad.nrungs = height;
+    elif( engine == "count" ):
+        lad = fastladder.countladder(0.5, 0.4, seed = seed);
+        lad.counts = np.bincount(levels, minlength = height).astype(np.int64);
+    else: # problem
+        raise ValueError("MakeLadder engine must be ladder, array or count, not "+str(engine) );
+
+    return lad; #### end make ladder
+
+################################################################################
+# individual benchmarks
+################################################################################
+
+def BenchTimeStep(engine, N, height, mintime = 0.2):
+    """
+    Time ladder.TimeStep (or the fastladder equivalent). After one untimed warm
+    up step, the number of steps is grown until a run takes at least mintime,
+    so that small ladders aren't timed over a few noisy steps
+
+    Args:
+    engine, N, height, see MakeLadder
+    mintime, optional, double, shortest timed run in seconds
+
+    Returns dict of results
+    """
+
+    lad = MakeLadder(engine, N, height);
+    lad.TimeStep(); # warm up
+    def Steps():
+        for t in range(nsteps):
+            lad.TimeStep();
+
+    # grow the run until it is long enough, aiming a little past mintime
+    nsteps = 1;
+    sec = Time(Steps, repeat = 1);
+    while( sec < mintime ):
+        nsteps = max(2*nsteps, int(1.2*nsteps*mintime/max(sec, 1e-9)) );
+        sec = Time(Steps, repeat = 1);
+    sec = sec/nsteps;
+
+    return {"bench": "TimeStep", "engine": engine, "N": N, "height": height, "nsteps": nsteps,
+        "sec_per_step": sec, "particle_steps_per_sec": N/sec}; #### end bench time step
+
+def BenchPhases(N, height, nsteps = 3):
+    """
+    Time the phases of ladder.TimeStep on the object ladder, using its
+    instrumentation, see ladder.Instrument
+
+    Returns dict of results, seconds per step in each phase
+    """
+
+    lad = MakeLadder("ladder", N, height);
+    lad.Instrument();
+    for t in range(nsteps):
+        lad.TimeStep();
+    metrics = lad.Metrics();
+
+    res = {"bench": "TimeStepPhases", "N": N, "height": height};
+    for key in ladder.METRICS:
+        if( key.startswith("sec") ):
+            res[key+"_per_step"] = metrics[key]/nsteps;
+
+    return res; #### end bench phases
+
+def BenchStart(N, depth):
+    """
+    Time ladder.Start on agents nested depth levels deep
+
+    Returns dict of results
+    """
+
+    # nest a flat list of agents into sublists of 10
+    parts = agent.population(N, 0.5, 0.4).Views();
+    for d in range(depth):
+        parts = [parts[i:i+10] for i in range(0, len(parts), 10)];
+
+    sec = Time(lambda : ladder.ladder().Start(parts) );
+
+    return {"bench": "Start", "N": N, "depth": depth, "sec": sec,
+        "particles_per_sec": N/sec}; #### end bench start
+
+def BenchDLL(n):
+    """
+    Time DoubleLinkedList append, indexing and insert on a list of length n
+
+    Returns dict of results
+    """
+
+    dll = ladder.DoubleLinkedList();
+    append = Time(lambda : [dll.append(i) for i in range(n)], repeat = 1)/n;
+    index = Time(lambda : [dll[i] for i in range(0, len(dll), max(1, len(dll)//1000))] )/min(1000, len(dll));
+    insert = Time(lambda : [dll.insert(-1, len(dll)//2) for i in range(100)], repeat = 1)/100;
+
+    return {"bench": "DoubleLinkedList", "n": n, "sec_per_append": append,
+        "sec_per_index": index, "sec_per_insert": insert}; #### end bench dll
+
+def BenchObservables(N, height):
+    """
+    Time ladder.N and ladder.maxE on the object ladder
+
+    Returns dict of results
+    """
+
+    lad = MakeLadder("ladder", N, height);
+    nsec = Time(lad.N);
+    esec = Time(lad.maxE);
+
+    return {"bench": "N_maxE", "N": N, "height": height, "sec_per_N": nsec,
+        "sec_per_maxE": esec}; #### end bench observables
+
+def BenchAct(n):
+    """
+    Time agent.Act for a single agent, drawing from a randomblock
+
+    Returns dict of results
+    """
+
+    a = agent.agent(0.5, 0.4);
+    rng = agent.randomblock(0);
+    sec = Time(lambda : [a.Act(rng) for i in range(n)] );
+
+    return {"bench": "Act", "n": n, "sec": sec, "acts_per_sec": n/sec}; #### end bench act
+
+################################################################################
+# running the whole suite
+################################################################################
+
+def RunAll(max_particles = 10**6, heights = (10, 100), max_object = 10**5):
+    """
+    Run every benchmark over a range of sizes
+
+    Args:
+    max_particles, optional, int, largest particle count, counts go up by 10x
+        from 100
+    heights, optional, tuple of ints, ladder heights to time steps at
+    max_object, optional, int, largest particle count for the object ladder,
+        which is much slower than the array engines
+
+    Returns dict with machine info and list of results
+    """
+
+    sizes = [10**k for k in range(2, int(np.log10(max_particles))+1)];
+    results = [];
+
+    # time steps for each engine
+    for N in sizes:
+        for height in heights:
+            for engine in ("ladder", "array", "count"):
+                if( engine == "ladder" and N > max_object ):
+                    continue;
+                results.append(BenchTimeStep(engine, N, height) );
+
+    # everything else
+    for N in sizes:
+        if( N <= max_object ):
+            results.append(BenchStart(N, depth = 2) );
+            for height in heights:
+                results.append(BenchObservables(N, height) );
+                results.append(BenchPhases(N, height) );
+    for n in (100, 1000, 10000):
+        results.append(BenchDLL(n) );
+    results.append(BenchAct(10**5) );
+
+    return {"python": sys.version.split()[0], "numpy": np.__version__,
+        "machine": platform.platform(), "results": results}; #### end run all
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    parser = argparse.ArgumentParser(description = "Time the ladder and agent hot paths");
+    parser.add_argument("--max-particles", type = int, default = 10**6);
+    parser.add_argument("--max-object", type = int, default = 10**5);
+    parser.add_argument("--heights", type = int, nargs = "+", default = [10, 100]);
+    parser.add_argument("--out", default = None, help = "json file, prints to stdout if not given");
+    args = parser.parse_args();
+
+    res = RunAll(args.max_particles, args.heights, args.max_object);
+    if( args.out ):
+        with open(args.out, "w") as f:
+            json.dump(res, f, indent = 1);
+    else:
+        print(json.dumps(res, indent = 1) );
@@ -0,0 +1,330 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+cache.py:
+This module keeps the results of ladder runs on disk, so that sweeps which rerun
+the same configuration get the stored result back instead of simulating again.
+Results are .npz files named by a hash of the run configuration and of the
+source code, so changing either one gives a fresh entry. Files are written to a
+temp file and renamed into place, so several processes can share one cache
+directory without ever reading half written results, and the least recently used
+files are deleted once the cache grows past its size limit.
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# source files whose contents go into the code version
+CODE_FILES = ("agent.py", "ladder.py", "fastladder.py", "spectra.py", "observables.py", "ensemble.py", "cache.py");
+
+# hash of CODE_FILES, computed once per process
+VERSION = None;
+
+################################################################################
+# keys
+################################################################################
+
+def CodeVersion():
+    """
+    Hash of the source code, so results from older code are never returned
+
+    Returns string, hex sha256 digest
+    """
+
+    global VERSION;
+    if( VERSION is None ):
+        h = hashlib.sha256();
+        here = os.path.dirname(os.path.abspath(__file__) );
+        for fname in CODE_FILES:
+            h.update(fname.encode() );
+            with open(os.path.join(here, fname), "rb") as f:
+                h.update(f.read() );
+        VERSION = h.hexdigest();
+
+    return VERSION; #### end code version
+
+def Key(config):
+    """
+    Content address of a run, from its configuration and the code version
+
+    Args:
+    config, dict, everything that determines the result, values must be json
+        serializable or np scalars / arrays
+
+    Returns string, hex sha256 digest
+    """
+
+    text = json.dumps(config, sort_keys = True, default = lambda o: o.tolist() );
+    return hashlib.sha256((CodeVersion() + text).encode() ).hexdigest(); #### end key
+
+################################################################################
+# define the cache class
+################################################################################
+
+class cache(object):
+    """
+    Directory of result files, one .npz per run configuration. A hit touches the
+    file, so file modification times give the least recently used order.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, path = None, maxbytes = 2**30):
+        """
+        Args:
+        path, optional, string, cache directory, created if needed, defaults to
+            ~/.cache/boltzmann
+        maxbytes, optional, int, size the cache is cut back to after each write
+        """
+
+        if( path is None ):
+            path = os.path.join(os.path.expanduser("~"), ".cache", "boltzmann");
+        os.makedirs(path, exist_ok = True);
+        self.path = path;
+        self.maxbytes = maxbytes;
+
+        # hit and miss counts for this process
+        self.hits = 0;
+        self.misses = 0;
+
+        return; #### end init
+
+    def __str__(self):
+
+        return "cache("+self.path+", "+str(len(self.Files() ))+" files, "+str(self.Size() )+" bytes)";
+
+    def __contains__(self, config):
+
+        return os.path.exists(self.File(config) );
+
+    #### access
+
+    def File(self, config):
+        """
+        Returns string, file the result of config is stored in
+        """
+
+        return os.path.join(self.path, Key(config)+".npz"); #### end file
+
+    def Get(self, config):
+        """
+        Stored result of a run
+
+        Args:
+        config, dict, run configuration, see Key
+
+        Returns dict of np arrays (0d arrays as python scalars), or None on a miss
+        """
+
+        fname = self.File(config);
+        try:
+            with np.load(fname) as f:
+                result = {key: (f[key].item() if f[key].ndim == 0 else f[key]) for key in f.files};
+        except (FileNotFoundError, ValueError, OSError): # missing, or evicted under us
+            self.misses += 1;
+            return None;
+
+        # mark as recently used
+        try:
+            os.utime(fname);
+        except FileNotFoundError:
+            pass;
+        self.hits += 1;
+
+        return result; #### end get
+
+    def Put(self, config, result):
+        """
+        Store the result of a run. The file is written under a temp name and
+        renamed into place, which is atomic, so readers see either no file or
+        all of it, and two processes storing the same run just overwrite each
+        other with the same result.
+
+        Args:
+        config, dict, run configuration, see Key
+        result, dict of np arrays or scalars
+        """
+
+        fd, tmp = tempfile.mkstemp(dir = self.path, suffix = ".tmp");
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **result);
+            os.replace(tmp, self.File(config) );
+        except BaseException:
+            if( os.path.exists(tmp) ):
+                os.remove(tmp);
+            raise;
+        self.Evict();
+
+        #### end put
+
+    #### housekeeping
+
+    def Files(self):
+        """
+        Result files with their size and last use, skipping any deleted by
+        another process while looking
+
+        Returns list of tuples (mtime, size, fname)
+        """
+
+        files = [];
+        for name in os.listdir(self.path):
+            if( not name.endswith(".npz") ):
+                continue;
+            fname = os.path.join(self.path, name);
+            try:
+                st = os.stat(fname);
+            except FileNotFoundError:
+                continue;
+            files.append((st.st_mtime, st.st_size, fname) );
+
+        return files; #### end files
+
+    def Size(self):
+        """
+        Returns int, total bytes of result files
+        """
+
+        return sum(size for mtime, size, fname in self.Files() ); #### end size
+
+    def Evict(self, maxbytes = None, tmpage = 3600):
+        """
+        Delete least recently used files until the cache is under maxbytes, and
+        temp files left behind by processes that died while writing
+
+        Args:
+        maxbytes, optional, int, defaults to the cache's limit
+        tmpage, optional, double, seconds after which a temp file is stale
+        """
+
+        if( maxbytes is None ):
+            maxbytes = self.maxbytes;
+
+        # results, oldest first
+        files = sorted(self.Files() );
+        total = sum(size for mtime, size, fname in files);
+        for mtime, size, fname in files:
+            if( total <= maxbytes ):
+                break;
+            try:
+                os.remove(fname);
+            except FileNotFoundError: # another process got there first
+                pass;
+            total -= size;
+
+        # stale temp files
+        now = time.time();
+        for name in os.listdir(self.path):
+            if( name.endswith(".tmp") ):
+                try:
+                    if( now - os.stat(os.path.join(self.path, name)).st_mtime > tmpage ):
+                        os.remove(os.path.join(self.path, name) );
+                except FileNotFoundError:
+                    pass;
+
+        #### end evict
+
+    def Clear(self):
+        """
+        Delete every result file
+        """
+
+        self.Evict(maxbytes = 0); #### end clear
+
+
+################################################################################
+# cached runs
+################################################################################
+
+def Run(prob_stay, prob_up, N, nsteps, seed, store = None, burnin = None, engine = "count", bitgen = "PCG64"):
+    """
+    Run a ladder of N identical agents from the bottom rung, or get the result
+    from the cache if this run was done before. Observables are averaged over
+    the steps after burn in.
+
+    Args:
+    prob_stay, prob_up, doubles, choice probs of all the agents
+    N, int, number of agents
+    nsteps, int, number of time steps
+    seed, int, seeds the run. None means fresh entropy, and the result is
+        neither looked up nor stored since it can't be reproduced
+    store, optional, cache object, defaults to cache()
+    burnin, optional, int, steps before observables are collected, defaults
+        to nsteps//2
+    engine, optional, string, "ladder", "array" or "count", see ensemble.Make
+    bitgen, optional, string, name of bit generator, see agent.BITGENS
+
+    Returns dict, "final_occupancy" plus the observer.Report() entries
+    """
+
+    import ensemble
+    import observables
+
+    if( burnin is None ):
+        burnin = nsteps//2;
+    config = {"run": "Run", "engine": engine, "prob_stay": prob_stay, "prob_up": prob_up,
+        "N": N, "nsteps": nsteps, "burnin": burnin, "seed": seed, "bitgen": bitgen};
+
+    # look up
+    if( seed is not None ):
+        if( store is None ):
+            store = cache();
+        result = store.Get(config);
+        if( result is not None ):
+            return result;
+
+    # simulate
+    lad = ensemble.Make(engine, prob_stay, prob_up, N, seed, bitgen);
+    obs = observables.observer();
+    for t in range(nsteps):
+        if( t == burnin ):
+            obs.Attach(lad);
+        lad.TimeStep();
+    result = obs.Report();
+    result["final_occupancy"] = lad.Occupancy();
+
+    if( seed is not None ):
+        store.Put(config, result);
+
+    return result; #### end run
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def CacheTestCode():
+
+    store = cache(os.path.join(tempfile.gettempdir(), "boltzmann_cache_test") );
+    store.Clear();
+
+    # first time simulates, second time is a hit
+    for i in range(2):
+        t0 = time.perf_counter();
+        res = Run(0.5, 0.3, 10000, 2000, seed = 0, store = store);
+        print("T = "+str(res["T"])+", took "+str(time.perf_counter() - t0)+" s");
+    print(store);
+
+    return; #### end cache test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    CacheTestCode();
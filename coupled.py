@@ -0,0 +1,323 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+coupled.py:
+This module puts several ladders in thermal contact. Each ladder starts with its
+own population of agents, and so its own temperature, and particles hop between
+ladders at given coupling rates, landing on the same rung of the new ladder. An
+agent keeps its (stay, up) probs when it hops, so particles are tracked by
+species, the ladder they started on, as in fastladder.speciesladder. The
+occupancy of every ladder lives in one shared array, the ladders are stepped
+concurrently by a pool of threads, and the hops between ladders are applied
+afterwards in a separate, synchronized exchange phase.
+"""
+
+import agent
+import fastladder
+import observables
+import spectra
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+################################################################################
+# define the system class
+################################################################################
+
+class system(object):
+    """
+    Many coupled count ladders. The state is counts[i, s, r], the number of
+    particles of species s (started on ladder s, with its probs) on rung r of
+    ladder i. A time step has two phases:
+    - step, every ladder steps all the species on it with one call to
+        fastladder.CountStep, using its own random stream, all ladders at once
+        in the thread pool
+    - exchange, every particle hops from ladder i to ladder j with prob
+        K[i, j], all hops drawn from the counts after the step phase, so the
+        order ladders are handled in doesn't matter
+    """
+
+    #### overloaded methods
+
+    def __init__(self, params, N, coupling = 0.01, seed = None, bitgen = "PCG64", nworkers = None, spec = None):
+        """
+        Args:
+        params, list of (prob_stay, prob_up) tuples, probs of the agents that
+            start on each ladder, one per ladder
+        N, int or sequence of ints, number of agents starting on the bottom rung
+            of each ladder
+        coupling, optional, double, prob per step that a particle hops to some
+            other ladder, all ladders equally likely, or 2d np array K, where
+            K[i, j] is the prob per step to hop from ladder i to ladder j
+        seed, optional, seeds the random streams, one per ladder, see
+            agent.Substreams
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        nworkers, optional, int, number of threads, defaults to one per ladder
+            up to the thread pool's default
+        spec, optional, spectra.spectrum, energy of each rung, shared by all
+            the ladders
+        """
+
+        n = len(params);
+        self.nladders = n;
+        self.params = np.array(params, dtype = float);
+        if( self.params.shape != (n, 2) or (self.params < 0).any() or (self.params > 1).any() ):
+            raise ValueError("Cannot init system : params must be (prob_stay, prob_up) pairs between 0 and 1");
+
+        # coupling matrix
+        if( np.ndim(coupling) == 0 ):
+            K = np.full((n, n), coupling/max(n - 1, 1) );
+        else:
+            K = np.array(coupling, dtype = float);
+        if( K.shape != (n, n) or (K < 0).any() ):
+            raise ValueError("Cannot init system : coupling must be a non negative double or "+str(n)+" x "+str(n)+" array");
+        np.fill_diagonal(K, 0);
+        if( (K.sum(axis = 1) > 1).any() ):
+            raise ValueError("Cannot init system : prob to leave a ladder must be at most 1");
+        self.K = K;
+
+        # occupancy of every ladder, shared by the worker threads
+        self.counts = np.zeros((n, n, 16), dtype = np.int64);
+        self.counts[np.arange(n), np.arange(n), 0] = N;
+        self.nrungs = 1; # rungs created so far, same for every ladder
+        self.spec = spectra.Uniform() if spec is None else spec; # energy of each rung
+
+        # number of time steps taken so far
+        self.t = 0;
+
+        # functions called as hook(system) at the end of each time step
+        self.hooks = [];
+        self.views = [member(self, i) for i in range(n)];
+
+        # one random stream per ladder, each used by one thread at a time
+        self.rngs = agent.Substreams(seed, n, bitgen);
+        self.pool = ThreadPoolExecutor(min(n, 32) if nworkers is None else nworkers);
+
+        return; #### end init
+
+    def __str__(self):
+        '''
+        String representation, number of particles and temperature of each ladder
+        '''
+
+        retlist = "";
+        for i, (T, errT) in enumerate(self.Temperatures() ):
+            retlist += "ladder "+str(i)+": N = "+str(self.N(i))+", T = "+str(T)+" +/- "+str(errT)+"\n";
+
+        return retlist; #### end str
+
+    #### basic access methods
+
+    def N(self, i = None):
+        """
+        Number of particles on ladder i, or on all of them if i is None
+        """
+
+        if( i is None ):
+            return int(self.counts.sum() );
+        return int(self.counts[i].sum() ); #### end N
+
+    def Occupancy(self):
+        """
+        Number of particles on each rung of each ladder, all species together
+
+        Returns 2d np array of ints, shape (number of ladders, number of rungs)
+        """
+
+        return self.counts[:, :, :self.nrungs].sum(axis = 1); #### end occupancy
+
+    def Species(self):
+        """
+        Number of particles of each species on each ladder, ie where the agents
+        that started on each ladder are now
+
+        Returns 2d np array of ints, [i, s] is the number from ladder s on ladder i
+        """
+
+        return self.counts.sum(axis = 2); #### end species
+
+    def Energies(self):
+        """
+        Energy of each rung, the same on every ladder
+
+        Returns 1d np array of doubles
+        """
+
+        return self.spec.Energies(self.nrungs).copy(); #### end energies
+
+    def Temperatures(self):
+        """
+        Temperature of each ladder, from a fit to its current occupancy, see
+        observables.FitTemperature. For a smoother estimate attach an observer
+        to a single ladder with Ladder(i).
+
+        Returns list of tuples (T, error on T), one per ladder
+        """
+
+        E = self.Energies();
+        g = self.spec.Degeneracies(self.nrungs).astype(float);
+        return [observables.FitTemperature(occ, E, g) for occ in self.Occupancy()]; #### end temperatures
+
+    def Ladder(self, i):
+        """
+        Ladder i on its own, with Occupancy(), Energies() and hooks like a
+        single ladder, so observers and recorders can be attached to it
+
+        Returns member object
+        """
+
+        return self.views[i]; #### end ladder
+
+    #### time evolution of the system
+
+    def StepLadder(self, i):
+        """
+        Step phase for ladder i, done in place on its slice of counts. Run in a
+        worker thread, it only touches ladder i and its own random stream.
+
+        Returns int, number of rungs now needed by ladder i
+        """
+
+        # species on this ladder, each a row stepped with its own probs
+        species = np.flatnonzero(self.counts[i, :, :self.nrungs].any(axis = 1) );
+        if( len(species) == 0 ):
+            return self.nrungs;
+        probs = self.params[species];
+        new = fastladder.CountStep(self.counts[i, species, :self.nrungs], probs[:, :1], probs[:, 1:], self.rngs[i], self.spec.Top() );
+        self.counts[i, species, :new.shape[1]] = new;
+
+        return new.shape[1]; #### end step ladder
+
+    def Outflow(self, i):
+        """
+        Exchange phase for ladder i, draw how many particles of each species on
+        each rung hop to each other ladder. Run in a worker thread, it only reads
+        counts, so all ladders see the counts from after the step phase.
+
+        Returns tuple (nbrs, s, r, moved), ladders hopped to, species and rung
+        of each cell with particles leaving, and 2d np array of ints where
+        moved[c, k] is the number leaving cell c for ladder nbrs[k]
+        """
+
+        nbrs = np.flatnonzero(self.K[i]);
+        s, r = np.nonzero(self.counts[i, :, :self.nrungs]);
+        if( len(nbrs) == 0 ):
+            return nbrs, s[:0], r[:0], np.zeros((0, 0), dtype = np.int64);
+
+        # how many leave each occupied (species, rung) cell, then where they go,
+        # so the multinomial is only drawn for the few cells anyone leaves
+        rng, K = self.rngs[i], self.K[i, nbrs];
+        leave = rng.binomial(self.counts[i, s, r], K.sum() );
+        m = leave > 0;
+        moved = rng.multinomial(leave[m], K/K.sum() );
+
+        return nbrs, s[m], r[m], moved; #### end outflow
+
+    def TimeStep(self):
+        """
+        One time step of every ladder, then the hops between ladders
+        """
+
+        # make sure every ladder has room to grow by one rung
+        if( self.nrungs + 1 > self.counts.shape[2] ):
+            self.counts = np.concatenate((self.counts, np.zeros(self.counts.shape, dtype = np.int64)), axis = 2);
+
+        # step phase, all ladders at once
+        self.nrungs = max(self.pool.map(self.StepLadder, range(self.nladders)) );
+
+        # exchange phase, outflows drawn at once then applied together
+        outs = list(self.pool.map(self.Outflow, range(self.nladders)) );
+        for i, (nbrs, s, r, moved) in enumerate(outs):
+            self.counts[i, s, r] -= moved.sum(axis = 1);
+            self.counts[nbrs[:, None], s, r] += moved.T; # each (ladder, species, rung) once
+
+        # update step counter, let anything watching the run see the new state
+        self.t += 1;
+        for hook in self.hooks:
+            hook(self);
+        for view in self.views:
+            for hook in view.hooks:
+                hook(view);
+
+        #### end time step
+
+    def Close(self):
+        """
+        Shut down the thread pool
+        """
+
+        self.pool.shutdown(); #### end close
+
+
+class member(object):
+    """
+    One ladder of a coupled system, looks like a single ladder to observers
+    and recorders. Its hooks are called by the system after each time step.
+    """
+
+    def __init__(self, sys, i):
+
+        self.sys = sys;
+        self.i = i;
+        self.hooks = [];
+
+        return; #### end init
+
+    @property
+    def spec(self):
+        return self.sys.spec;
+
+    @property
+    def t(self):
+        return self.sys.t;
+
+    def N(self):
+        return self.sys.N(self.i);
+
+    def Occupancy(self):
+        return self.sys.Occupancy()[self.i];
+
+    def Energies(self):
+        return self.sys.Energies();
+
+    #### end member
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def CoupledTestCode(nladders = 4, N = 10000, nsteps = 2000):
+
+    import master
+
+    # ladders at different temperatures
+    params = [(0.5, up) for up in np.linspace(0.1, 0.4, nladders)];
+    print("uncoupled T = "+str([round(float(master.Temperature(*p)), 3) for p in params]) );
+
+    # put them in contact and watch the temperatures come together
+    sys = system(params, N, coupling = 0.01, seed = 0);
+    for t in range(nsteps):
+        sys.TimeStep();
+        if( (t+1) % (nsteps//5) == 0 ):
+            print("t = "+str(t+1)+", T = "+str([round(T, 3) for T, errT in sys.Temperatures()]) );
+    sys.Close();
+
+    return; #### end coupled test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    CoupledTestCode();
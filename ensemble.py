@@ -0,0 +1,180 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+ensemble.py:
+This module runs many independent ladder replicas over a grid of agent
+parameters, spread over a pool of processes, and collects the rung occupancy
+histograms for each parameter point.
+"""
+
+import agent
+import ladder
+import fastladder
+
+import numpy as np
+import multiprocessing
+
+################################################################################
+# running a single replica
+################################################################################
+
+def Make(engine, prob_stay, prob_up, N, seed = None, bitgen = "PCG64"):
+    """
+    Make a ladder of the given engine with N identical agents on the bottom rung
+
+    Args:
+    engine, string, "ladder", "array" or "count", which ladder to use
+    prob_stay, prob_up, doubles, choice probs of all the agents
+    N, int, number of agents
+    seed, optional, seeds the random stream of the ladder, see agent.Generator
+    bitgen, optional, string, name of bit generator, see agent.BITGENS
+
+    Returns ladder object of the given engine
+    """
+
+    if( engine == "ladder" ):
+        lad = ladder.ladder(seed = seed, bitgen = bitgen);
+        lad.Start(agent.population(N, prob_stay, prob_up) );
+    elif( engine == "array" ):
+        lad = fastladder.arrayladder(seed = seed, bitgen = bitgen);
+        lad.Start(agent.population(N, prob_stay, prob_up) );
+    elif( engine == "count" ):
+        lad = fastladder.countladder(prob_stay, prob_up, seed = seed, bitgen = bitgen);
+        lad.Start(N);
+    else: # problem
+        raise ValueError("Replica engine must be ladder, array or count, not "+str(engine) );
+
+    return lad; #### end make
+
+def Replica(task):
+    """
+    Run one ladder replica from the bottom rung and return its final occupancy.
+    Meant to be called in a worker process, so takes a single tuple argument.
+
+    Args:
+    task, tuple of (engine, prob_stay, prob_up, N, nsteps, seedseq, bitgen) where
+        engine, string, "ladder", "array" or "count", which ladder to use
+        prob_stay, prob_up, doubles, choice probs of all the agents
+        N, int, number of agents
+        nsteps, int, number of time steps to run
+        seedseq, np.random.SeedSequence, seeds the random stream of this replica
+        bitgen, string, name of bit generator, see agent.BITGENS
+
+    Returns 1d np array of ints, number of particles on each rung
+    """
+
+    engine, prob_stay, prob_up, N, nsteps, seedseq, bitgen = task;
+
+    # make ladder and agents, each replica gets its own stream seeded from its
+    # own seed sequence so the result does not depend on which worker runs it
+    lad = Make(engine, prob_stay, prob_up, N, seedseq, bitgen);
+
+    # go over time steps
+    for t in range(nsteps):
+        lad.TimeStep();
+
+    return lad.Occupancy(); #### end replica
+
+################################################################################
+# running many replicas
+################################################################################
+
+def Ensemble(params, N, nsteps, nreplicas = 1, seed = None, nworkers = None, engine = "count", bitgen = "PCG64", store = None):
+    """
+    Run nreplicas independent replicas at each (prob_stay, prob_up) point, using
+    a pool of worker processes. Every replica gets a random stream spawned from
+    one master seed, so the results only depend on the seed, not on the number
+    of workers.
+
+    Args:
+    params, list of (prob_stay, prob_up) tuples, parameter points to run
+    N, int, number of agents in each replica
+    nsteps, int, number of time steps each replica runs
+    nreplicas, optional, int, number of replicas at each parameter point
+    seed, optional, int, master seed, if None fresh entropy is used
+    nworkers, optional, int, number of processes, defaults to number of cores.
+        1 runs everything in this process
+    engine, optional, string, "ladder", "array" or "count", see Replica
+    bitgen, optional, string, name of bit generator, see agent.BITGENS. SFC64
+        is faster for runs limited by random number generation
+    store, optional, cache.cache, replicas found there are not rerun and new
+        ones are stored. Only used with a seed, since otherwise nothing repeats
+
+    Returns list of 1d np arrays, one per parameter point, holding the number of
+    particles on each rung summed over the replicas at that point
+    """
+
+    # one independent seed sequence per replica
+    children = np.random.SeedSequence(seed).spawn(len(params)*nreplicas);
+    tasks = [];
+    for i, (prob_stay, prob_up) in enumerate(params):
+        for j in range(nreplicas):
+            tasks.append((engine, prob_stay, prob_up, N, nsteps, children[i*nreplicas + j], bitgen) );
+
+    # look up replicas run before, each is keyed by its own seed sequence
+    results = [None]*len(tasks);
+    if( store is not None and seed is not None ):
+        configs = [{"run": "Replica", "engine": task[0], "prob_stay": task[1], "prob_up": task[2],
+            "N": task[3], "nsteps": task[4], "entropy": task[5].entropy,
+            "spawn_key": list(task[5].spawn_key), "bitgen": task[6]} for task in tasks];
+        for i, config in enumerate(configs):
+            hit = store.Get(config);
+            if( hit is not None ):
+                results[i] = hit["occupancy"];
+    todo = [i for i in range(len(tasks)) if results[i] is None];
+
+    # run replicas
+    if( nworkers == 1 or len(todo) <= 1 ):
+        ran = list(map(Replica, [tasks[i] for i in todo]) );
+    else:
+        with multiprocessing.Pool(nworkers) as pool:
+            ran = pool.map(Replica, [tasks[i] for i in todo], chunksize = max(1, len(todo)//(4*(nworkers or multiprocessing.cpu_count()) )) );
+    for i, r in zip(todo, ran):
+        results[i] = r;
+        if( store is not None and seed is not None ):
+            store.Put(configs[i], {"occupancy": r});
+
+    # sum occupancies at each parameter point, padding to the highest rung
+    hists = [];
+    for i in range(len(params)):
+        reps = results[i*nreplicas:(i+1)*nreplicas];
+        hist = np.zeros(max(len(r) for r in reps), dtype = np.int64);
+        for r in reps:
+            hist[:len(r)] += r;
+        hists.append(hist);
+
+    return hists; #### end ensemble
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def EnsembleTestCode():
+
+    # grid of parameter points
+    params = [(0.5, up) for up in (0.1, 0.2, 0.3, 0.4)];
+
+    # run them, print normalized occupancies
+    hists = Ensemble(params, 1000, 200, nreplicas = 8, seed = 0);
+    for p, h in zip(params, hists):
+        print(str(p)+": "+str(np.round(h/h.sum(), 3)) );
+
+    return; #### end ensemble test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    EnsembleTestCode();
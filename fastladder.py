@@ -0,0 +1,935 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+fastladder.py:
+This module codes array based versions of the ladder. Instead of moving agent
+objects between rung lists, the state of the system is kept in numpy arrays and
+all particles are advanced with one batched random draw per time step. The
+boundary rules are the same as in ladder.Place.
+"""
+
+import agent
+import spectra
+
+import numpy as np
+
+################################################################################
+# ladder where every particle is a row in a set of arrays
+################################################################################
+
+class arrayladder(object):
+    """
+    Each particle is described by its rung index and its two choice probabilities
+    (stay, up), held in parallel 1d np arrays. The ladder itself is just the number
+    of rungs created so far, with their energies looked up in a spectra.spectrum.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, seed = None, bitgen = "PCG64", spec = None):
+        """
+        begin the ladder with only a starting rung and no particles. All higher
+        rungs will be created when needed.
+
+        Args:
+        seed, optional, None (fresh entropy), int, np.random.SeedSequence or
+            np.random.Generator, seeds the random stream of this ladder, see
+            agent.Generator
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        spec, optional, spectra.spectrum, energy of each rung, defaults to
+            uniform rungs 1 energy unit apart
+        """
+
+        # per particle state
+        self.rungs = np.zeros(0, dtype = int); # rung index of each particle
+        self.stay = np.zeros(0); # prob to stay on rung of each particle
+        self.up = np.zeros(0); # prob to go up once off rung of each particle
+
+        # ladder state
+        self.nrungs = 1; # rungs created so far, as in ladder only bottom to start
+        self.spec = spectra.Uniform() if spec is None else spec; # energy of each rung
+        self.deltaE = self.spec.deltaE;
+
+        # number of time steps taken so far
+        self.t = 0;
+
+        # functions called as hook(ladder) at the end of each time step
+        self.hooks = [];
+
+        # random stream for the batched draws
+        self.rng = agent.Generator(seed, bitgen);
+
+        return; #### end init
+
+    def __str__(self):
+        '''
+        String representation of the ladder, same format as ladder.__str__
+        '''
+
+        retlist = "";
+        for i, n in enumerate(self.Occupancy() ):
+            retlist += self.spec.Label(i) + "[ "+str(n)+" ]\n";
+
+        return retlist; #### end str
+
+    #### basic access methods
+
+    def N(self):
+        """
+        Quickly get how many total particles are in the ladder
+        """
+
+        return len(self.rungs);
+
+    def maxE(self):
+        """
+        Return the energy of the max occupied rung ( ie Fermi energy), or of the
+        bottom rung if there are no particles
+        """
+
+        return self.spec.Energy(int(self.rungs.max(initial = 0)) );
+
+    def Occupancy(self):
+        """
+        Number of particles on each rung, bottom to top
+
+        Returns 1d np array of ints, length is number of rungs created so far
+        """
+
+        return np.bincount(self.rungs, minlength = self.nrungs);
+
+    def Energies(self):
+        """
+        Energy of each rung, bottom to top
+
+        Returns 1d np array of doubles, length is number of rungs created so far
+        """
+
+        return self.spec.Energies(self.nrungs).copy();
+
+    #### placement of particles on rung
+
+    def Start(self, parts, level = 0):
+        """
+        start the particles on the lowest rung, or any other rung(s)
+
+        Args:
+        parts: single agent or any iterable of agents (can be higher dimension also),
+            or an agent.population
+        level: optional, int rung to start every particle on, or sequence of ints
+            giving the starting rung of each particle, in the order of the
+            flattened parts
+        """
+
+        # probs of the new particles, populations already have them in arrays
+        if( isinstance(parts, agent.population) ):
+            stay, up = parts.stay, parts.up;
+        else:
+            parts = agent.Flatten(parts);
+            stay = np.array([a.stay for a in parts], dtype = float);
+            up = np.array([a.up for a in parts], dtype = float);
+
+        # starting rungs
+        rungs = np.zeros(len(stay), dtype = int);
+        rungs[:] = level;
+        if( len(rungs) and rungs.min() < 0 ):
+            raise ValueError("Cannot start particles below the bottom rung");
+        if( len(rungs) ):
+            self.spec.Check(int(rungs.max()) );
+
+        # add new rows for these particles
+        self.rungs = np.concatenate((self.rungs, rungs) );
+        self.stay = np.concatenate((self.stay, stay) );
+        self.up = np.concatenate((self.up, up) );
+        if( len(rungs) ):
+            self.nrungs = max(self.nrungs, int(rungs.max())+1);
+
+        #### end start
+
+    #### time evolution of the system
+
+    def TimeStep(self):
+        """
+        This method enacts the change in the state of the system with one time step.
+        Each particle makes the same two choices as agent.Act, but all choices are
+        drawn at once. Boundary rules are the same as ladder.Place: a particle on
+        the bottom rung that chooses down stays put, and a particle that goes past
+        the top rung creates a new rung, unless it is the top of the spectrum.
+        """
+
+        # two uniform draws per particle, as in agent.OnRung and agent.OnLadder
+        alpha = self.rng.random((2, len(self.rungs)) );
+
+        # delta is 0 for stay, 1 for up, -1 for down
+        leave = alpha[0] >= self.stay;
+        delta = np.where(alpha[1] < self.up, 1, -1)*leave;
+
+        # move, with the bottom rung reflecting and the top of the spectrum capped
+        self.rungs = np.maximum(self.rungs + delta, 0);
+        if( self.spec.Top() is not None ):
+            self.rungs = np.minimum(self.rungs, self.spec.Top() );
+
+        # grow the ladder if anyone went past the top
+        if( len(self.rungs) ):
+            self.nrungs = max(self.nrungs, int(self.rungs.max())+1);
+
+        # update step counter, let anything watching the run see the new state
+        self.t += 1;
+        for hook in self.hooks:
+            hook(self);
+
+        #### end time step
+
+
+################################################################################
+# ladder where only the number of particles on each rung is kept
+################################################################################
+
+def CountStep(counts, prob_stay, prob_up, rng, top = None):
+    """
+    One time step for a histogram of identical particles. On each rung, the
+    particles split into stay, up and down according to a multinomial draw,
+    done here as two chained binomial draws: first how many leave the rung, then
+    how many of those go up. Boundary rules are the same as ladder.Place.
+
+    Args:
+    counts, 1d np array of ints, number of particles on each rung. Can also be
+        nd, with rungs along the last axis, to step several histograms at once
+    prob_stay, prob_up, doubles, choice probs shared by all the particles, or
+        np arrays broadcasting against counts, eg one row of probs per histogram
+    rng, np.random.Generator to draw from
+    top, optional, int, highest level, up movers from it stay put, see
+        spectra.spectrum.Top
+
+    Returns np array of ints, new counts, one rung longer than counts if any
+    particle went past the top rung
+    """
+
+    # split particles on each rung
+    leave = rng.binomial(counts, 1 - prob_stay);
+    up = rng.binomial(leave, prob_up);
+    down = leave - up;
+
+    # new counts, with one extra rung in case particles left the top
+    new = np.zeros(counts.shape[:-1]+(counts.shape[-1]+1,), dtype = np.int64);
+    new[..., :-1] += counts - leave; # stayers
+    new[..., 1:] += up; # up movers
+    new[..., :-2] += down[..., 1:]; # down movers
+    new[..., 0] += down[..., 0]; # down from the bottom rung means stay put
+
+    # only keep the extra rung if someone created it, up movers past the top
+    # level go back where they were
+    if( top is not None and new.shape[-1] > top + 1 ):
+        new[..., top] += new[..., top+1];
+        new = new[..., :top+1];
+    elif( not new[..., -1].any() ):
+        new = new[..., :-1];
+
+    return new; #### end count step
+
+def ExclusionStep(counts, prob_stay, prob_up, capacity, rng):
+    """
+    CountStep in exclusion mode, where a move into a rung already holding its
+    capacity is rejected and the particle stays put. The rungs are gone through
+    bottom to top as in ladder.TimeStep, and the room on a rung is whatever is
+    left when its turn comes, so this draws from the same distribution as the
+    object ladder in exclusion mode. The draws are batched as in CountStep, only
+    the acceptance is a loop over rungs.
+
+    Args:
+    counts, 1d np array of ints, number of particles on each rung
+    prob_stay, prob_up, doubles, choice probs shared by all the particles
+    capacity, 1d np array of ints, most particles each rung can hold, at least
+        one longer than counts, 0 above the top of the spectrum
+    rng, np.random.Generator to draw from
+
+    Returns 1d np array of ints, new counts, one longer than counts if any
+    particle went past the top rung
+    """
+
+    # split particles on each rung
+    leave = rng.binomial(counts, 1 - prob_stay);
+    up = rng.binomial(leave, prob_up).tolist();
+    down = (leave - up).tolist();
+
+    # accept moves rung by rung, as python ints since the loop is scalar
+    new = counts.tolist() + [0];
+    free = (capacity[:len(new)] - new).tolist(); # room left on each rung
+    for i in np.flatnonzero(leave).tolist():
+        n = min(up[i], free[i+1]);
+        new[i+1] += n;
+        free[i+1] -= n;
+        new[i] -= n;
+        free[i] += n;
+        if( i > 0 ): # down from the bottom rung means stay put
+            n = min(down[i], free[i-1]);
+            new[i-1] += n;
+            free[i-1] -= n;
+            new[i] -= n;
+            free[i] += n;
+
+    # only keep the extra rung if someone created it
+    if( new[-1] == 0 ):
+        new.pop();
+
+    return np.array(new, dtype = np.int64); #### end exclusion step
+
+class countladder(object):
+    """
+    When every particle shares the same (stay, up) probabilities they are
+    indistinguishable, and the state of the system is fully described by the
+    number of particles on each rung. The cost of a time step is then set by the
+    number of rungs, not the number of particles.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, prob_stay, prob_up, seed = None, bitgen = "PCG64", spec = None, capacity = None):
+        """
+        Args:
+        prob_stay, prob_up, doubles, choice probs shared by all the particles,
+            same meaning as in agent.agent
+        seed, optional, None (fresh entropy), int, np.random.SeedSequence or
+            np.random.Generator, seeds the random stream of this ladder, see
+            agent.Generator
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        spec, optional, spectra.spectrum, energy of each rung, defaults to
+            uniform rungs 1 energy unit apart
+        capacity, optional, turns on exclusion mode, see ladder.ladder, steps
+            are then done with ExclusionStep
+        """
+
+        # check reasonability of probabilites
+        if( prob_stay > 1 or prob_stay < 0 ):
+            raise ValueError("Cannot init countladder : prob stay must be 0 < prob_stay < 1");
+
+        elif( prob_up > 1 or prob_up < 0 ):
+            raise ValueError("Cannot init countladder : prob up must be 0 < prob_up < 1");
+
+        # probabilities shared by all particles
+        self.stay = prob_stay;
+        self.up = prob_up;
+
+        # ladder state
+        self.counts = np.zeros(1, dtype = np.int64); # particles on each rung, only bottom to start
+        self.spec = spectra.Uniform() if spec is None else spec; # energy of each rung
+        self.deltaE = self.spec.deltaE;
+
+        # exclusion mode, most particles each rung can hold, None for no limit
+        self.capacity = capacity;
+        self.cap = None if capacity is None else spectra.Capacities(capacity, self.spec, 2);
+
+        # number of time steps taken so far
+        self.t = 0;
+
+        # functions called as hook(ladder) at the end of each time step
+        self.hooks = [];
+
+        # random stream for the batched draws
+        self.rng = agent.Generator(seed, bitgen);
+
+        return; #### end init
+
+    def __str__(self):
+        '''
+        String representation of the ladder, same format as ladder.__str__
+        '''
+
+        retlist = "";
+        for i, n in enumerate(self.counts):
+            retlist += self.spec.Label(i) + "[ "+str(n)+" ]\n";
+
+        return retlist; #### end str
+
+    #### basic access methods
+
+    def N(self):
+        """
+        Quickly get how many total particles are in the ladder
+        """
+
+        return int(self.counts.sum() );
+
+    def maxE(self):
+        """
+        Return the energy of the max occupied rung ( ie Fermi energy), or of the
+        bottom rung if there are no particles
+        """
+
+        occ = np.flatnonzero(self.counts);
+        return self.spec.Energy(int(occ[-1]) if len(occ) else 0);
+
+    def Occupancy(self):
+        """
+        Number of particles on each rung, bottom to top
+
+        Returns 1d np array of ints, length is number of rungs created so far
+        """
+
+        return self.counts.copy();
+
+    def Energies(self):
+        """
+        Energy of each rung, bottom to top
+
+        Returns 1d np array of doubles, length is number of rungs created so far
+        """
+
+        return self.spec.Energies(len(self.counts)).copy();
+
+    #### placement of particles on rung
+
+    def Start(self, parts, level = 0):
+        """
+        start the particles on the lowest rung, or any other rung(s)
+
+        Args:
+        parts: int number of particles, 1d np array of ints giving the number of
+            particles to add to each rung, or single agent or any iterable of
+            agents (including object arrays of them), or agent.population, which
+            must all have the same probs as this ladder
+        level: optional, int rung to start every particle on, or for agents a
+            sequence of ints giving the starting rung of each. Ignored if parts is
+            an array of counts. In exclusion mode no rung may end up over its
+            capacity
+        """
+
+        # whole distribution at once, object arrays hold agents instead
+        if( isinstance(parts, np.ndarray) and parts.dtype.kind != "O" ):
+            if( parts.ndim != 1 or parts.dtype.kind not in "iu" or (len(parts) and parts.min() < 0) ):
+                raise ValueError("Start counts must be a 1d array of non negative ints");
+            add = parts.astype(np.int64);
+
+        # just a number of particles
+        elif( isinstance(parts, (int, np.integer)) ):
+            if( parts < 0 ):
+                raise ValueError("Cannot start a negative number of particles");
+            if( level < 0 ):
+                raise ValueError("Cannot start particles below the bottom rung");
+            add = np.zeros(level+1, dtype = np.int64);
+            add[level] = parts;
+
+        # agents, checking they match the ladder
+        else:
+            if( isinstance(parts, agent.population) ):
+                stay, up = parts.stay, parts.up;
+            else:
+                parts = agent.Flatten(parts);
+                stay = np.array([a.stay for a in parts], dtype = float);
+                up = np.array([a.up for a in parts], dtype = float);
+            if( (stay != self.stay).any() or (up != self.up).any() ):
+                raise ValueError("Agents do not match countladder probs");
+            rungs = np.zeros(len(stay), dtype = int);
+            rungs[:] = level;
+            if( len(rungs) and rungs.min() < 0 ):
+                raise ValueError("Cannot start particles below the bottom rung");
+            add = np.bincount(rungs, minlength = 1).astype(np.int64);
+
+        # add to counts, growing the ladder if needed
+        if( add.any() ):
+            self.spec.Check(int(np.flatnonzero(add)[-1]) );
+        if( len(add) > len(self.counts) ):
+            self.counts = np.concatenate((self.counts, np.zeros(len(add) - len(self.counts), dtype = np.int64)) );
+        if( self.cap is not None ):
+            self.cap = spectra.Capacities(self.capacity, self.spec, len(self.counts)+1);
+            if( (self.counts[:len(add)] + add > self.cap[:len(add)]).any() ):
+                raise ValueError("Cannot start particles over the capacity of a rung");
+        self.counts[:len(add)] += add;
+
+        #### end start
+
+    #### time evolution of the system
+
+    def TimeStep(self):
+        """
+        This method enacts the change in the state of the system with one time step.
+        On each rung, the particles split into stay, up and down with a multinomial
+        draw, see CountStep, or ExclusionStep in exclusion mode.
+        """
+
+        if( self.cap is None ):
+            self.counts = CountStep(self.counts, self.stay, self.up, self.rng, self.spec.Top() );
+        else:
+            if( len(self.cap) <= len(self.counts) ): # room for the rung above the top
+                self.cap = spectra.Capacities(self.capacity, self.spec, 2*len(self.counts) );
+            self.counts = ExclusionStep(self.counts, self.stay, self.up, self.cap, self.rng);
+
+        # update step counter, let anything watching the run see the new state
+        self.t += 1;
+        for hook in self.hooks:
+            hook(self);
+
+        #### end time step
+
+
+################################################################################
+# ladder of several species, each a histogram
+################################################################################
+
+class speciesladder(object):
+    """
+    Mixed populations usually hold a few species of agents, each species sharing
+    one (stay, up) pair. Agents within a species are indistinguishable, so each
+    species is kept as a count of particles on each rung and stepped with
+    CountStep, as in countladder. The cost of a time step is then set by the
+    number of species times the number of rungs. Agents we want to follow one by
+    one, picked out by name, are kept as objects and stepped with agent.Act.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, track = ("verbose",), seed = None, bitgen = "PCG64", spec = None):
+        """
+        begin the ladder with only a starting rung and no particles. All higher
+        rungs will be created when needed.
+
+        Args:
+        track, optional, iterable of strings, names of agents to track one by one
+            rather than lump into their species
+        seed, optional, None (fresh entropy), int, np.random.SeedSequence or
+            np.random.Generator, seeds the random stream of this ladder, see
+            agent.Generator
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        spec, optional, spectra.spectrum, energy of each rung, defaults to
+            uniform rungs 1 energy unit apart
+        """
+
+        # species, maps (stay, up) to 1d np array of number on each rung
+        self.species = {};
+
+        # individually tracked agents and the rung each is on
+        self.track = set(track);
+        self.tracked = [];
+        self.trackrungs = [];
+
+        # ladder state
+        self.nrungs = 1; # rungs created so far, only bottom to start
+        self.spec = spectra.Uniform() if spec is None else spec; # energy of each rung
+        self.deltaE = self.spec.deltaE;
+
+        # number of time steps taken so far
+        self.t = 0;
+
+        # functions called as hook(ladder) at the end of each time step
+        self.hooks = [];
+
+        # random streams, batched draws for species, blocks for tracked agents
+        self.rng = agent.Generator(seed, bitgen);
+        self.block = agent.randomblock(self.rng.integers(2**62), bitgen = bitgen);
+
+        return; #### end init
+
+    def __str__(self):
+        '''
+        String representation of the ladder, same format as ladder.__str__, with
+        an X for each tracked agent on the rung
+        '''
+
+        retlist = "";
+        for i, n in enumerate(self.Occupancy() ):
+            retlist += self.spec.Label(i) + "[ "+str(n)+" ]";
+            retlist += " X"*self.trackrungs.count(i) + "\n";
+
+        return retlist; #### end str
+
+    #### basic access methods
+
+    def N(self):
+        """
+        Quickly get how many total particles are in the ladder
+        """
+
+        return int(sum(c.sum() for c in self.species.values()) ) + len(self.tracked);
+
+    def maxE(self):
+        """
+        Return the energy of the max occupied rung ( ie Fermi energy), or of the
+        bottom rung if there are no particles
+        """
+
+        occ = np.flatnonzero(self.Occupancy() );
+        return self.spec.Energy(int(occ[-1]) if len(occ) else 0);
+
+    def Occupancy(self):
+        """
+        Number of particles on each rung, bottom to top, all species together
+
+        Returns 1d np array of ints, length is number of rungs created so far
+        """
+
+        occ = np.bincount(np.array(self.trackrungs, dtype = int), minlength = self.nrungs).astype(np.int64);
+        for c in self.species.values():
+            occ[:len(c)] += c;
+
+        return occ; #### end occupancy
+
+    def Energies(self):
+        """
+        Energy of each rung, bottom to top
+
+        Returns 1d np array of doubles, length is number of rungs created so far
+        """
+
+        return self.spec.Energies(self.nrungs).copy();
+
+    #### placement of particles on rung
+
+    def AddSpecies(self, prob_stay, prob_up, n, level = 0):
+        """
+        start n anonymous particles of one species on the lowest rung, or any
+        other rung
+
+        Args:
+        prob_stay, prob_up, doubles, choice probs of the species
+        n, int, number of particles
+        level, optional, int, rung to start them on
+        """
+
+        # make sure probs are reasonable by making an agent with them
+        agent.agent(prob_stay, prob_up);
+        if( level < 0 ):
+            raise ValueError("Cannot start particles below the bottom rung");
+        self.spec.Check(level);
+
+        key = (float(prob_stay), float(prob_up) );
+        if( key not in self.species ):
+            self.species[key] = np.zeros(1, dtype = np.int64);
+        if( level >= len(self.species[key]) ):
+            self.species[key] = np.concatenate((self.species[key], np.zeros(level + 1 - len(self.species[key]), dtype = np.int64)) );
+        self.species[key][level] += n;
+        self.nrungs = max(self.nrungs, level + 1);
+
+        #### end add species
+
+    def Start(self, parts, level = 0):
+        """
+        start the particles on the lowest rung, or any other rung. Agents with
+        tracked names are kept as objects and the rest are grouped into species
+
+        Args:
+        parts: single agent or any iterable of agents (can be higher dimension also),
+            or an agent.population
+        level: optional, int, rung to start them on
+        """
+
+        self.spec.Check(level);
+
+        # populations are grouped all at once
+        if( isinstance(parts, agent.population) ):
+
+            # pull out tracked agents by name
+            keep = np.ones(len(parts), dtype = bool);
+            if( not isinstance(parts.names, str) ):
+                for i, name in enumerate(parts.names):
+                    if( name in self.track ):
+                        keep[i] = False;
+                        self.tracked.append(parts[i]);
+            elif( parts.names in self.track ):
+                keep[:] = False;
+                self.tracked.extend(parts.Views() );
+
+            # the rest by their probs
+            pairs, counts = np.unique(np.stack((parts.stay[keep], parts.up[keep]), axis = 1), axis = 0, return_counts = True);
+            for (prob_stay, prob_up), n in zip(pairs.tolist(), counts.tolist() ):
+                self.AddSpecies(prob_stay, prob_up, n, level);
+
+        # otherwise count agents of each species
+        else:
+            counts = {};
+            for p in agent.Flatten(parts):
+                if( p.name in self.track ):
+                    self.tracked.append(p);
+                else:
+                    key = (p.stay, p.up);
+                    counts[key] = counts.get(key, 0) + 1;
+            for (prob_stay, prob_up), n in counts.items():
+                self.AddSpecies(prob_stay, prob_up, n, level);
+
+        # tracked agents all start on the given rung
+        self.trackrungs.extend([level]*(len(self.tracked) - len(self.trackrungs)) );
+        self.nrungs = max(self.nrungs, level + 1);
+
+        #### end start
+
+    #### time evolution of the system
+
+    def TimeStep(self):
+        """
+        This method enacts the change in the state of the system with one time step.
+        Each species is stepped with CountStep, each tracked agent with its Act
+        method. Boundary rules are the same as ladder.Place.
+        """
+
+        # species
+        for key, counts in self.species.items():
+            self.species[key] = CountStep(counts, key[0], key[1], self.rng, self.spec.Top() );
+            self.nrungs = max(self.nrungs, len(self.species[key]) );
+
+        # tracked agents
+        for i, a in enumerate(self.tracked):
+            self.trackrungs[i] = max(self.trackrungs[i] + a.Act(self.block), 0);
+            if( self.spec.Top() is not None ):
+                self.trackrungs[i] = min(self.trackrungs[i], self.spec.Top() );
+            self.nrungs = max(self.nrungs, self.trackrungs[i] + 1);
+
+        # update step counter, let anything watching the run see the new state
+        self.t += 1;
+        for hook in self.hooks:
+            hook(self);
+
+        #### end time step
+
+
+################################################################################
+# ladder where only particles that actually move are touched
+################################################################################
+
+class eventladder(object):
+    """
+    When prob_stay is close to 1 almost every call to agent.Act returns 0, so
+    most of the work in a time step does nothing. Here each particle instead
+    draws how many steps it waits until it next leaves its rung, which is
+    geometric with success prob 1 - stay, and is filed in a calendar under the
+    step it will move on. A time step then only touches the particles due to
+    move. Since the geometric wait is memoryless, the occupancy at each step has
+    exactly the same distribution as stepping every particle every time.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, seed = None, bitgen = "PCG64", spec = None):
+        """
+        begin the ladder with only a starting rung and no particles. All higher
+        rungs will be created when needed.
+
+        Args:
+        seed, optional, None (fresh entropy), int, np.random.SeedSequence or
+            np.random.Generator, seeds the random stream of this ladder, see
+            agent.Generator
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        spec, optional, spectra.spectrum, energy of each rung, defaults to
+            uniform rungs 1 energy unit apart
+        """
+
+        # per particle state
+        self.rungs = np.zeros(0, dtype = int); # rung index of each particle
+        self.stay = np.zeros(0); # prob to stay on rung of each particle
+        self.up = np.zeros(0); # prob to go up once off rung of each particle
+
+        # ladder state
+        self.counts = np.zeros(1, dtype = np.int64); # particles on each rung, only bottom to start
+        self.spec = spectra.Uniform() if spec is None else spec; # energy of each rung
+        self.deltaE = self.spec.deltaE;
+
+        # calendar of moves, maps time step to list of arrays of particle indices
+        self.calendar = {};
+
+        # number of time steps taken so far
+        self.t = 0;
+
+        # functions called as hook(ladder) at the end of each time step
+        self.hooks = [];
+
+        # random stream for the batched draws
+        self.rng = agent.Generator(seed, bitgen);
+
+        return; #### end init
+
+    def __str__(self):
+        '''
+        String representation of the ladder, same format as ladder.__str__
+        '''
+
+        retlist = "";
+        for i, n in enumerate(self.counts):
+            retlist += self.spec.Label(i) + "[ "+str(n)+" ]\n";
+
+        return retlist; #### end str
+
+    #### basic access methods
+
+    def N(self):
+        """
+        Quickly get how many total particles are in the ladder
+        """
+
+        return len(self.rungs);
+
+    def maxE(self):
+        """
+        Return the energy of the max occupied rung ( ie Fermi energy), or of the
+        bottom rung if there are no particles
+        """
+
+        occ = np.flatnonzero(self.counts);
+        return self.spec.Energy(int(occ[-1]) if len(occ) else 0);
+
+    def Occupancy(self):
+        """
+        Number of particles on each rung, bottom to top
+
+        Returns 1d np array of ints, length is number of rungs created so far
+        """
+
+        return self.counts.copy();
+
+    def Energies(self):
+        """
+        Energy of each rung, bottom to top
+
+        Returns 1d np array of doubles, length is number of rungs created so far
+        """
+
+        return self.spec.Energies(len(self.counts)).copy();
+
+    #### placement of particles on rung
+
+    def Start(self, parts, level = 0):
+        """
+        start the particles on the lowest rung, or any other rung(s)
+
+        Args:
+        parts: single agent or any iterable of agents (can be higher dimension also),
+            or an agent.population
+        level: optional, int rung to start every particle on, or sequence of ints
+            giving the starting rung of each particle, in the order of the
+            flattened parts
+        """
+
+        # reuse arrayladder to flatten the input into arrays
+        new = arrayladder(spec = self.spec);
+        new.Start(parts, level);
+
+        # add new rows for these particles
+        first = len(self.rungs);
+        self.rungs = np.concatenate((self.rungs, new.rungs) );
+        self.stay = np.concatenate((self.stay, new.stay) );
+        self.up = np.concatenate((self.up, new.up) );
+        add = np.bincount(new.rungs, minlength = len(self.counts) );
+        if( len(add) > len(self.counts) ):
+            self.counts = np.concatenate((self.counts, np.zeros(len(add) - len(self.counts), dtype = np.int64)) );
+        self.counts += add;
+
+        # put them in the calendar
+        self.Schedule(np.arange(first, len(self.rungs)) );
+
+        #### end start
+
+    def Schedule(self, idx):
+        """
+        Draw the next move time of each of the given particles and file them in
+        the calendar. Particles with stay = 1 never move so are left out.
+
+        Args:
+        idx, 1d np array of ints, particles to schedule
+        """
+
+        idx = idx[self.stay[idx] < 1];
+        if( len(idx) == 0 ):
+            return;
+
+        # wait is the number of steps until the particle leaves its rung, 1
+        # means it leaves on the very next step
+        when = self.t + self.rng.geometric(1 - self.stay[idx]);
+
+        # group by time step
+        order = np.argsort(when, kind = "stable");
+        when, idx = when[order], idx[order];
+        times, firsts = np.unique(when, return_index = True);
+        for time, chunk in zip(times.tolist(), np.split(idx, firsts[1:]) ):
+            self.calendar.setdefault(time, []).append(chunk);
+
+        #### end schedule
+
+    #### time evolution of the system
+
+    def TimeStep(self):
+        """
+        This method enacts the change in the state of the system with one time step.
+        Only the particles whose wait ends this step move, each going up with its
+        prob up and down otherwise. Boundary rules are the same as ladder.Place.
+        """
+
+        self.t += 1;
+
+        # particles leaving their rung this step
+        chunks = self.calendar.pop(self.t, None);
+        if( chunks is not None ):
+            idx = np.concatenate(chunks);
+
+            # up or down, with the bottom rung reflecting and the top of the spectrum capped
+            old = self.rungs[idx];
+            new = np.maximum(old + np.where(self.rng.random(len(idx)) < self.up[idx], 1, -1), 0);
+            if( self.spec.Top() is not None ):
+                new = np.minimum(new, self.spec.Top() );
+            self.rungs[idx] = new;
+
+            # grow the ladder if anyone went past the top, then update counts
+            top = int(new.max() ) + 1;
+            if( top > len(self.counts) ):
+                self.counts = np.concatenate((self.counts, np.zeros(top - len(self.counts), dtype = np.int64)) );
+            self.counts -= np.bincount(old, minlength = len(self.counts) );
+            self.counts += np.bincount(new, minlength = len(self.counts) );
+
+            # next move of each of them
+            self.Schedule(idx);
+
+        # let anything watching the run see the new state
+        for hook in self.hooks:
+            hook(self);
+
+        #### end time step
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def CompareTestCode(N = 1000, nsteps = 50):
+    """
+    Evolve the same agents with the object ladder and the array ladder and print
+    the resulting occupancies side by side.
+    """
+
+    import ladder
+
+    # make ladders and the same agents for each
+    lad = ladder.ladder();
+    arr = arrayladder();
+    cnt = countladder(0.5, 0.3);
+    evt = eventladder();
+    lad.Start([agent.agent(0.5, 0.3) for i in range(N)]);
+    arr.Start([agent.agent(0.5, 0.3) for i in range(N)]);
+    cnt.Start(N);
+    evt.Start([agent.agent(0.5, 0.3) for i in range(N)]);
+
+    # go over some time steps
+    for t in range(nsteps):
+        lad.TimeStep();
+        arr.TimeStep();
+        cnt.TimeStep();
+        evt.TimeStep();
+
+    print("object ladder:\n"+str(lad.Occupancy()) );
+    print("array ladder:\n"+str(arr.Occupancy()) );
+    print("count ladder:\n"+str(cnt.Occupancy()) );
+    print("event ladder:\n"+str(evt.Occupancy()) );
+
+    return; #### end compare test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    CompareTestCode();
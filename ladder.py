@@ -15,8 +15,14 @@ The ladder tracks the particles as they move between its rungs.
 """
 
 import agent
+import spectra
 
 import numpy as np
+import time
+
+# what an instrumented time step counts and times, see ladder.Instrument
+METRICS = ("up", "down", "stay", "created", "reflected", "rejected",
+    "sec_in", "sec_act", "sec_place", "sec_hooks");
 
 ################################################################################
 # base class of ladder is doubly linked list
@@ -70,9 +76,13 @@ class DoubleLinkedList(object):
         '''
         Create the empty DLL. The starting node, set to None, is the only definitive atrribute.
         Start node and all other items are Item objects (see above).
+        The end node and a list of all nodes by position are also kept so that
+        length, indexing and append do not have to walk the links.
         '''
         
         self.start = None;
+        self.end = None; # last Item in the DLL
+        self.nodes = []; # python list of Items, nodes[i] is the ith Item
         
         return; #### end init
     
@@ -90,8 +100,8 @@ class DoubleLinkedList(object):
         Length of DLL
         '''
         
-        # simply use length of simple list version of DLL
-        return len(self.In() );
+        # number of Items is tracked in the node index
+        return len(self.nodes);
     
     
     def __getitem__(self, i):
@@ -113,13 +123,8 @@ class DoubleLinkedList(object):
         if( i >= len(self) ):
             raise IndexError;
         
-        # step thru the list using links i times
-        n = self.start; # start with starting item
-        for j in range(i): # each time update to next item
-            n = n.next; # gets next item
-            
-        # n is now the ith item
-        return n; #### end getitem
+        # look up the ith item in the node index
+        return self.nodes[i]; #### end getitem
             
             
         
@@ -138,8 +143,10 @@ class DoubleLinkedList(object):
         # make sure list is empty
         if( self.start == None):
             
-            # add as starting Item object
+            # add as starting Item object, which is also the end
             self.start = Item(it);
+            self.end = self.start;
+            self.nodes = [self.start];
             
         else: # list is not empty
             raise Exception("Called insertEmpty() but "+str(self)+" is not empty.");
@@ -157,7 +164,7 @@ class DoubleLinkedList(object):
         
         # if empty just insert it at start
         if( self.start == None):
-            self.start = Item(it);
+            self.insertEmpty(it);
             return;
         
         # otherwise have to push back the start node and link it
@@ -170,6 +177,7 @@ class DoubleLinkedList(object):
         
         # add new item as start of DLL
         self.start = new;
+        self.nodes.insert(0, new);
         
         return; #### end insertStart
     
@@ -184,12 +192,12 @@ class DoubleLinkedList(object):
         
         # if list is empty we just put it in at start
         if( self.start == None):
-            self.start = Item(it);
+            self.insertEmpty(it);
             return;
         
         # otherwise have to stick on at end
         # get last item
-        last = self[len(self)-1 ];
+        last = self.end;
         
         # create new item
         new = Item(it);
@@ -198,6 +206,10 @@ class DoubleLinkedList(object):
         last.next = new;
         new.prev = last;
         
+        # new item is now the end
+        self.end = new;
+        self.nodes.append(new);
+        
         return; #### end append
     
     
@@ -221,6 +233,9 @@ class DoubleLinkedList(object):
         # ie we have not emptied the list
         if( self.start != None):
             self.start.prev = None;
+        else:
+            self.end = None;
+        del self.nodes[0];
         
         # return the content of the now unlinked start node
         return start_item.content; #### end pop
@@ -241,34 +256,16 @@ class DoubleLinkedList(object):
         
         # if i = 0, we put it at start
         if( i == 0):
-            
-            # replace start reference
-            old_start = self.start; # grabs old start Item
-            self.start = Item(it);
-            
-            # link old and new starts
-            self.start.next = old_start;
-            old_start.prev = self.start;
-            
+            self.insertStart(it);
             return;
         
         # if i is length of DLL, we put it at end
         elif( i == len(self) ):
-            
-            # get the old last item
-            last = self[len(self) - 1];
-            
-            # link to new last item
-            new = Item(it);
-            last.next = new;
-            new.prev = last;
-            
+            self.append(it);
             return;
         
-        # otherwise, iter thru the first i - 1 elements
-        n = self.start;
-        for j in range(i - 1):
-            n = n.next; # update n
+        # otherwise, get the i - 1th element from the node index
+        n = self.nodes[i - 1];
             
         # now n refers to the i-1th Item
         # we add the new item right after this
@@ -280,6 +277,9 @@ class DoubleLinkedList(object):
         n.next.next = old_next;
         old_next.prev = n.next;
         
+        # new item is now the ith item in the node index
+        self.nodes.insert(i, n.next);
+        
         return;
         
         
@@ -294,25 +294,9 @@ class DoubleLinkedList(object):
         Python list object, whose elements are Item objects
         '''
         
-        # define return object
-        inlist = [];
-        
-        # if DLL is empty, preserve empty list
-        if( self.start == None):
-            return inlist;
-        
-        # traverse items, beginning at start
-        # stop when we encounter a link to None
-        n = self.start; # start with starting node of DLL
-        while (n != None):
-            
-            # add item to the list
-            inlist.append(n);
-            
-            # update n using link to next item
-            n = n.next;
-            
-        return inlist; #### end In
+        # node index already holds the items in order, return a copy so callers
+        # can't change the index by changing the list
+        return list(self.nodes); #### end In
     
 #### end DLL
 
@@ -330,11 +314,12 @@ class rung(object):
     
     #### overloaded methods
 
-    def __init__(self, E, occupants):
+    def __init__(self, E, occupants, level = 0):
         """
         Args:
         E, double, the energy level of the rung
         occupants, 1d np array, holds agent objects that are on this rung
+        level, optional, int, position of the rung in the ladder, bottom is 0
         """
         
         # check attribute types
@@ -347,6 +332,7 @@ class rung(object):
         # set attributes
         self.E = E; # energy of the rung
         self.occupants = occupants; # particles on the rung
+        self.level = level; # index of rung in ladder
         
         return; #### end init
         
@@ -355,13 +341,8 @@ class rung(object):
         String rep of ladder rung, should be what comes out when we print ladder
         """
         
-        # show occupancy of rung and if it has any verbose agents
-        retstring = "[ "+str(len(self.occupants))+" ]";
-        for a in self.occupants: # look for verbose agents
-            if(a.name == "verbose"):
-                retstring += " X";
-                
-        return retstring; #### end repr
+        # show occupancy of rung, watched agents are marked by the ladder
+        return "[ "+str(len(self.occupants))+" ]"; #### end repr
 
 
 #### end rung class
@@ -371,17 +352,67 @@ class ladder(DoubleLinkedList):
 
     #### overloaded methods
 
-    def __init__(self):
+    def __init__(self, seed = None, bitgen = "PCG64", spec = None, capacity = None):
         """
         begin the ladder DLL with only a starting rung. All higher rungs will be
         created when needed.
-        """
         
-        # place rung in DLL item, place item at start of ladder
-        self.start = Item(rung(0, []) );
+        Args:
+        seed, optional, seeds the random stream the agents on this ladder draw
+            from, so runs can be reproduced. None (fresh entropy), int,
+            np.random.SeedSequence, np.random.Generator, or an agent.randomblock
+            which is used as is
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        spec, optional, spectra.spectrum, energy of each rung, defaults to
+            uniform rungs 1 energy unit apart
+        capacity, optional, turns on exclusion mode, where a move into a full
+            rung is rejected and the particle stays put. None for no limit, int
+            for the same capacity on every rung (1 for Pauli like filling),
+            "degeneracy" for g particles on a rung of degeneracy g, or 1d array
+            with one capacity per rung, see spectra.Capacities
+        """
         
         # how rungs correspond to energy
-        self.deltaE = 1; # each rung 1 energy unit higher
+        self.spec = spectra.Uniform() if spec is None else spec;
+        self.deltaE = self.spec.deltaE;
+        
+        # place rung in DLL item, place item at start of ladder
+        DoubleLinkedList.__init__(self);
+        self.insertEmpty(rung(self.spec.Energy(0), []) );
+        
+        # number of time steps taken so far
+        self.t = 0;
+        
+        # functions called as hook(ladder) at the end of each time step
+        self.hooks = [];
+        
+        # random numbers for agent decisions, drawn in blocks
+        if( isinstance(seed, agent.randomblock) ):
+            self.rng = seed;
+        else:
+            self.rng = agent.randomblock(seed, bitgen = bitgen);
+        
+        # particle counts, kept up to date as particles are placed and moved
+        self.n = 0; # total number of particles
+        self.counts = [0]; # number of particles on each rung
+        self.top = 0; # level of the highest occupied rung
+        
+        # exclusion mode, most particles each rung can hold, None for no limit
+        self.capacity = capacity;
+        self.cap = None if capacity is None else spectra.Capacities(capacity, self.spec, 1).tolist();
+        
+        # watched agents, see Watch
+        self.watched = {}; # maps agent to its column in the trace
+        self.where = {}; # maps watched agent to the rung it is on
+        self.sink = None; # gets debug messages about watched agents
+        self.positions = np.zeros((0, 0), dtype = int); # rung of each watched agent after each step
+        self.actions = np.zeros((0, 0), dtype = np.int8); # move each watched agent chose
+        self.ntrace = 0; # number of steps recorded
+        self.trace0 = 0; # step counter when recording began
+        
+        # instrumentation, see Instrument
+        self.metrics = None; # running totals, None when off
+        self.callback = None; # gets the metrics of each step
         
         return; #### end init
         
@@ -390,14 +421,58 @@ class ladder(DoubleLinkedList):
         String representation of the DLL
         '''
         
-        # print each item of the DLL In() list on separate line
+        # print each item of the DLL In() list on separate line, with an X for
+        # each watched agent on the rung
         retlist = ""
-        for i in range(len(self.In())):
-            retlist += "E = "+str(i*self.deltaE);
-            retlist += " "*(7-len("E = "+str(i*self.deltaE)) ) + str(self[i]) + "\n";
+        where = list(self.where.values() );
+        for i, r in enumerate(self.nodes):
+            retlist += self.spec.Label(i) + str(r) + " X"*where.count(i) + "\n";
             
         return retlist; #### end str
         
+    def append(self, r):
+        '''
+        Add a rung to the top of the ladder, keeping the particle counts in step
+        
+        Args:
+        :param r: rung object, its level is set to its place in the ladder
+        '''
+        
+        r.level = len(self);
+        DoubleLinkedList.append(self, r);
+        
+        # count any particles already on it
+        self.counts.append(len(r.occupants) );
+        self.n += len(r.occupants);
+        if( r.occupants ):
+            self.top = r.level;
+        if( self.cap is not None ):
+            self.cap.append(int(spectra.Capacities(self.capacity, self.spec, r.level+1)[-1]) );
+        
+        return; #### end append
+        
+    def insertStart(self, r):
+        '''
+        Rungs are only ever added at the top, with append, so that each rung's
+        level matches its place in the ladder and the particle counts stay right
+        '''
+        
+        raise ValueError("Cannot insert rungs into a ladder, only append them at the top"); #### end insertStart
+        
+    def insert(self, r, i):
+        '''
+        See insertStart
+        '''
+        
+        raise ValueError("Cannot insert rungs into a ladder, only append them at the top"); #### end insert
+        
+    def pop(self):
+        '''
+        Rungs are never removed, a ladder only grows
+        '''
+        
+        raise ValueError("Cannot remove rungs from a ladder"); #### end pop
+        
     #### basic access methods
     
     def N(self):
@@ -405,96 +480,284 @@ class ladder(DoubleLinkedList):
         Quickly get how many total particles are in the ladder
         """
         
-        # return var
-        counter = 0;
-        
-        # iter over rungs
-        for r in self.In():
-            counter += len(r.content.occupants);
-            
-        return counter;
+        # kept up to date by Start and Place
+        return self.n;
         
     def maxE(self):
         """
         Return the energy of the max occupied rung ( ie Fermi energy)
         """
         
-        # iter backwards over rungs
-        r = self.In()[-1]; # start with topmost rung
+        # level of top occupied rung is kept up to date by Start and Place
+        return self.nodes[self.top].content.E;
+
+    def Occupancy(self):
+        """
+        Number of particles on each rung, bottom to top
+
+        Returns 1d np array of ints, length is number of rungs in the ladder
+        """
+
+        return np.array(self.counts);
         
-        while True: # keep going till we find EF and return
-            if(len(r.content.occupants) != 0): # this rung is occupied so is fermi E
-                return r.content.E;
-            
-            else: # try the one lower
-                r = r.prev;
+    def Energies(self):
+        """
+        Energy of each rung, bottom to top
+
+        Returns 1d np array of doubles, length is number of rungs in the ladder
+        """
         
+        # looked up in the spectrum's table rather than walking the rungs
+        return self.spec.Energies(len(self) ).copy();
+        
+    def Recount(self):
+        """
+        Count the particles on every rung from scratch. Only needed if rung
+        occupants lists were changed by hand rather than by Start and Place.
+        """
+        
+        self.counts = [len(r.content.occupants) for r in self.nodes];
+        self.n = sum(self.counts);
+        self.top = 0;
+        for i, n in enumerate(self.counts):
+            if( n ):
+                self.top = i;
+        
+        #### end recount
+
     #### placement of particles on rung
     
-    def Start(self, parts):
+    def Start(self, parts, level = 0):
         """
-        start the particle on the lowest rung
+        start the particles on the lowest rung, or any other rung(s)
         
         Args:
-        parts: single agent or any iterable of agents (can be higher dimension also)
+        parts: single agent or any iterable of agents (can be higher dimension also),
+            or an agent.population
+        level: optional, int rung to start every particle on, or sequence of ints
+            giving the starting rung of each particle, in the order of the
+            flattened parts. Rungs are created as needed. In exclusion mode no
+            rung may end up over its capacity.
         """
         
-        # try treating parts as an iterable
-        try:
-            # if parts is an iterable run over each part
-            for p in parts:
-                self.Start(p); # call recursively to allow nested inputs
+        # all the agents in one list
+        parts = agent.Flatten(parts);
+        
+        # group agents by starting rung
+        if( isinstance(level, (int, np.integer)) ):
+            groups = {int(level): parts};
+        else:
+            level = np.asarray(level, dtype = int);
+            if( level.shape != (len(parts),) ):
+                raise ValueError("Start needs one level per agent, got "+str(level.shape)+" for "+str(len(parts)) );
+            order = np.argsort(level, kind = "stable");
+            groups = {};
+            for i in order.tolist():
+                groups.setdefault(int(level[i]), []).append(parts[i]);
+        if( groups and min(groups) < 0 ):
+            raise ValueError("Cannot start particles below the bottom rung");
+        if( groups ):
+            self.spec.Check(max(groups) );
             
-        except: # should have reached input which is just an agent
-        
-            if(type(parts) == type (agent.TestAgent() ) ): # single agent
-                self.start.content.occupants.append(parts);
-                
-            else: #problem
-                raise ValueError("Start must take single agent or list of agent objects");
+        # check there is room for them, before any rungs are made so that a
+        # rejected start leaves the ladder as it was
+        if( self.cap is not None and groups ):
+            cap = spectra.Capacities(self.capacity, self.spec, max(groups)+1);
+            for lev, group in groups.items():
+                have = self.counts[lev] if lev < len(self.counts) else 0;
+                if( have + len(group) > cap[lev] ):
+                    raise ValueError("Cannot start "+str(len(group))+" particles on rung "+str(lev)+", it only has room for "+str(cap[lev] - have) );
+                    
+        # make sure the rungs exist
+        while( groups and len(self) <= max(groups) ):
+            self.append(rung(self.spec.Energy(len(self) ), []) );
+            
+        # put each group on its rung all at once
+        for lev, group in groups.items():
+            self.nodes[lev].content.occupants.extend(group);
+            self.counts[lev] += len(group);
+            self.n += len(group);
+            if( group and lev > self.top ):
+                self.top = lev;
                 
         #### end start
     
     def Place(self, part, r, delta):
         """
         Place the given particle, formerly on the given rung, onto new rung as
-        spec'd by delta (-1, 0, 1)
+        spec'd by delta (-1, 0, 1). The particle should already be off the old
+        rung's occupants list, but still counted there. In exclusion mode a move
+        into a full rung is rejected and the particle stays on the old rung.
+        
+        Returns the Item of the rung the particle was placed on
         """
 
-        # place based on value of delta
+        # find destination rung based on value of delta
         if(delta == -1): # lower rung
             
             # check that lower rung exists
             if(r.prev != None): # it is there
-                r.prev.content.occupants.append(part);
+                dest = r.prev;
             else: # particle has to stay on this (lowest) rung
-                r.content.occupants.append(part);
+                dest = r;
                 
         elif(delta == 0): # stay on this rung
-            r.content.occupants.append(part);
+            dest = r;
             
         elif(delta == 1): # upper rung
         
             # check that upper rung exists
-            if(r.next != None): # it exists
-                r.next.content.occupants.append(part);
+            if(r.next != None): # it is there
+                dest = r.next;
+                
+            elif(r.content.level == self.spec.Top() ): # top of the spectrum, particle has to stay
+                dest = r;
                 
             else: # we have to make it
             
                 # determine its properties
-                energy = r.content.E + self.deltaE; # energy goes up unit
+                energy = self.spec.Energy(r.content.level + 1); # next level of the spectrum
                 occ = [];
                 
                 # add it to ladder
                 self.append(rung(energy, occ)); # DLL append takes content, places it in item
-                
-                # place the particle
-                r.next.content.occupants.append(part);
+                dest = r.next;
                 
         else: # wrong delta value given
             raise ValueError("Place() can only place particles for delta = -1, 0, 1.\n");
             
-        #### end place
+        # exclusion mode, checked against the counts so no list is scanned
+        if( self.cap is not None and dest is not r and self.counts[dest.content.level] >= self.cap[dest.content.level] ):
+            dest = r;
+            
+        # place the particle
+        dest.content.occupants.append(part);
+        
+        # update counts if it changed rungs
+        if( dest is not r ):
+            src, dst = r.content.level, dest.content.level;
+            self.counts[src] -= 1;
+            self.counts[dst] += 1;
+            
+            # update highest occupied rung
+            if( dst > self.top ):
+                self.top = dst;
+            elif( src == self.top ):
+                while( self.top > 0 and self.counts[self.top] == 0 ):
+                    self.top -= 1;
+            
+        return dest; #### end place
+        
+    #### following chosen agents
+    
+    def Watch(self, parts, sink = None):
+        """
+        Follow the given agents as the run goes on. After each time step the
+        rung each one is on and the move it chose (1, 0, -1) are written into
+        preallocated arrays, see Trace. Only steps with watched agents pay for
+        this, otherwise TimeStep does no per agent checks at all.
+        
+        Args:
+        parts, single agent or any iterable of agents, as in Start
+        sink, optional, function called with a debug message as each watched
+            agent acts and is placed, eg print for the old debug output
+        """
+        
+        parts = agent.Flatten(parts);
+        if( not self.watched ):
+            self.trace0 = self.t;
+            self.ntrace = 0;
+        if( sink is not None ):
+            self.sink = sink;
+        new = [];
+        for a in parts: # an agent given twice only gets one column
+            if( a not in self.watched ):
+                self.watched[a] = len(self.watched);
+                new.append(a);
+            
+        # find where they are now, scanning the rungs once
+        look = set(new);
+        for r in self.nodes:
+            for a in r.content.occupants:
+                if( a in look ):
+                    self.where[a] = r.content.level;
+                    
+        # widen the trace, for earlier steps the new agents count as off the ladder
+        rows, cols = self.positions.shape;
+        self.positions = np.concatenate((self.positions, np.full((rows, len(self.watched) - cols), -1, dtype = int)), axis = 1);
+        self.actions = np.concatenate((self.actions, np.zeros((rows, len(self.watched) - cols), dtype = np.int8)), axis = 1);
+        
+        #### end watch
+        
+    def Unwatch(self):
+        """
+        Stop following every watched agent and throw away the trace
+        """
+        
+        self.watched = {};
+        self.where = {};
+        self.sink = None;
+        self.positions = np.zeros((0, 0), dtype = int);
+        self.actions = np.zeros((0, 0), dtype = np.int8);
+        self.ntrace = 0;
+        
+        #### end unwatch
+        
+    def Trace(self):
+        """
+        What the watched agents did on each step since watching began. Columns
+        are the agents in the order they were watched, an agent that is not on
+        the ladder has rung -1.
+        
+        Returns tuple of np arrays (t, positions, actions), t 1d array of step
+        numbers, positions 2d array of ints, rung of each agent after each step,
+        and actions 2d array of ints, move each agent chose on each step
+        """
+        
+        n = self.ntrace;
+        t = np.arange(self.trace0 + 1, self.trace0 + 1 + n);
+        
+        return t, self.positions[:n].copy(), self.actions[:n].copy(); #### end trace
+        
+    #### instrumentation
+    
+    def Instrument(self, on = True, callback = None):
+        """
+        Turn on counting and timing of each time step, see METRICS. Counted are
+        the moves chosen (up, down, stay), rungs created, down moves reflected at
+        the bottom and moves rejected by a full rung in exclusion mode or by the
+        top of the spectrum. Timed are the phases of the step, swapping in empty
+        occupants lists (in), agents choosing moves (act), placing them (place)
+        and running the hooks. When off, TimeStep only pays for one check.
+        
+        Args:
+        on, optional, bool, False turns instrumentation off again
+        callback, optional, function called as callback(metrics) after each
+            step with a dict of that step's metrics
+        """
+        
+        if( on ):
+            self.metrics = dict.fromkeys(("steps",) + METRICS, 0);
+            self.callback = callback;
+        else:
+            self.metrics = None;
+            self.callback = None;
+            
+        #### end instrument
+        
+    def Metrics(self):
+        """
+        Snapshot of the metrics summed over the steps since Instrument was called
+        
+        Returns dict, keys are "steps", METRICS and "sec", total of the timings
+        """
+        
+        if( self.metrics is None ):
+            raise ValueError("Metrics : instrumentation is off, call Instrument() first");
+        snap = dict(self.metrics);
+        snap["sec"] = sum(snap[key] for key in METRICS if key.startswith("sec") );
+        
+        return snap; #### end metrics
         
     #### time evolution of the system
     
@@ -505,61 +768,456 @@ class ladder(DoubleLinkedList):
         go up, down, or stay put (using its Act method).
         """
         
-        # iter over all rungs
-        for r in self.In(): # remember each r actually an item, w/ r.content a rung
+        # counted and timed version, see Instrument
+        if( self.metrics is not None ):
+            self.InstrumentedStep();
+            return;
         
-            # pull out old occupants of rung
-            occs = r.content.occupants
-            
-            # overwrite occupants list as empty
+        # swap every rung to an empty occupants list before anyone moves, so
+        # that agents placed this step land in the new lists and the old lists
+        # are each visited once, no flags needed
+        rungs = self.In(); # remember each r actually an item, w/ r.content a rung
+        olds = [r.content.occupants for r in rungs];
+        for r in rungs:
             r.content.occupants = [];
         
-            # iter over old occupants
-            for a in occs:
-                    
-            
-                # let this particle decide on action, if it hasn't yet
-                if(not a.flag):
+        # iter over old occupants of each rung
+        rng, place = self.rng, self.Place;
+        if( not self.watched ):
+            for r, occs in zip(rungs, olds):
+                for a in occs:
                 
-                    # Act returns 1 for go up, 0 for stay, -1 for go down
-                    delta = a.Act();
-                    
-                    if( a.name == "verbose"): # we want debug print statements for this a
-                        print("verbose acted with result: "+str(delta));
-                    
+                    # Act returns 1 for go up, 0 for stay, -1 for go down,
                     # move the agent to rung accordingly
-                    self.Place(a, r, delta);
-                        
-                    # flag that this particle already acted this time step
-                    a.flag = True;
+                    place(a, r, a.Act(rng) );
                     
-                    if( a.name == "verbose"): #debug
-                        print("verbose placed and flagged");
+        else: # same again, recording what the watched agents do
+            pos, act = self.TraceRow();
+            watched, where, sink = self.watched, self.where, self.sink;
+            for r, occs in zip(rungs, olds):
+                for a in occs:
+                    delta = a.Act(rng);
+                    j = watched.get(a);
+                    if( j is None ):
+                        place(a, r, delta);
+                        continue;
                         
-                # else if particle already acted, just put it back in occupants
-                else:
-                    r.content.occupants.append(a);
-                    
-                    if(a.name == "verbose"):
-                        print("verbose already acted, placed back on rung");
-                    
-        # after the entire step, reset all flags
-        for r in self.In():
-            for a in r.content.occupants:
-                a.flag = False;
-                
-                if( a.name == "verbose"): # debug
-                    print("end of time step, verbose flag reset");
+                    if( sink is not None ):
+                        sink(str(a.name)+" acted with result: "+str(delta) );
+                    dest = place(a, r, delta).content.level;
+                    pos[j] = dest;
+                    act[j] = delta;
+                    where[a] = dest;
+                    if( sink is not None ):
+                        sink(str(a.name)+" placed");
                 
+        # update step counter
+        self.t += 1;
+        
+        # let anything watching the run see the new state
+        for hook in self.hooks:
+            hook(self);
                     
         #### end time step
         
+    def InstrumentedStep(self):
+        """
+        TimeStep that also counts and times what happens, see Instrument. All
+        the agents on a rung act before any of them are placed, so the two
+        phases can be timed apart. Acting does not depend on where the other
+        agents are, so the draws and the result are the same as TimeStep.
+        """
+        
+        clock = time.perf_counter;
+        step = dict.fromkeys(METRICS, 0);
+        nrungs = len(self);
+        
+        # swap in empty occupants lists, as in TimeStep
+        t0 = clock();
+        rungs = self.In();
+        olds = [r.content.occupants for r in rungs];
+        for r in rungs:
+            r.content.occupants = [];
+        step["sec_in"] = clock() - t0;
+        
+        # act and place rung by rung
+        rng, place = self.rng, self.Place;
+        watched, where, sink = self.watched, self.where, self.sink;
+        if( watched ):
+            pos, act = self.TraceRow();
+        for r, occs in zip(rungs, olds):
+            t0 = clock();
+            deltas = [a.Act(rng) for a in occs];
+            t1 = clock();
+            for a, delta in zip(occs, deltas):
+                j = watched.get(a) if watched else None;
+                if( j is not None and sink is not None ):
+                    sink(str(a.name)+" acted with result: "+str(delta) );
+                dest = place(a, r, delta);
+                if( delta and dest is r ): # move that didn't happen
+                    if( delta == -1 and r.prev is None ):
+                        step["reflected"] += 1;
+                    else:
+                        step["rejected"] += 1;
+                if( j is not None ):
+                    pos[j] = dest.content.level;
+                    act[j] = delta;
+                    where[a] = dest.content.level;
+                    if( sink is not None ):
+                        sink(str(a.name)+" placed");
+            t2 = clock();
+            step["sec_act"] += t1 - t0;
+            step["sec_place"] += t2 - t1;
+            step["up"] += deltas.count(1);
+            step["down"] += deltas.count(-1);
+            step["stay"] += deltas.count(0);
+        step["created"] = len(self) - nrungs;
+        
+        # update step counter, run hooks
+        self.t += 1;
+        t0 = clock();
+        for hook in self.hooks:
+            hook(self);
+        step["sec_hooks"] = clock() - t0;
+        
+        # add to totals
+        self.metrics["steps"] += 1;
+        for key in METRICS:
+            self.metrics[key] += step[key];
+        if( self.callback is not None ):
+            self.callback(step);
+            
+        #### end instrumented step
+        
+    def TraceRow(self):
+        """
+        Next row of the trace arrays, growing them by doubling when full
+        
+        Returns tuple of 1d np arrays (positions, actions), views into the trace
+        """
+        
+        if( self.ntrace == len(self.positions) ):
+            rows = max(16, 2*len(self.positions) );
+            self.positions = np.concatenate((self.positions, np.full((rows - len(self.positions), len(self.watched)), -1, dtype = int)) );
+            self.actions = np.concatenate((self.actions, np.zeros((rows - len(self.actions), len(self.watched)), dtype = np.int8)) );
+        self.ntrace += 1;
+        
+        return self.positions[self.ntrace - 1], self.actions[self.ntrace - 1]; #### end trace row
+        
+    #### saving and loading the system
+    
+    def Save(self, fname):
+        """
+        Save the complete state of the system to a binary .npz file, so that a
+        run can be picked up later with Load(). The agents are stored as columns
+        (stay, up, name) in rung order rather than as pickled objects, along with
+        the rung energies and spectrum, capacities in exclusion mode, occupancy of
+        each rung, step counter and the state of the random stream the agents
+        draw from.
+        
+        Args:
+        fname, string, file to save to
+        """
+        
+        # agents in rung order, order within each rung is kept so that the
+        # random draws line up when the run is resumed
+        rungs = [r.content for r in self.nodes];
+        agents = [a for r in rungs for a in r.occupants];
+        
+        # state of the stream used by agent.Act
+        rng_state, rng_block = self.rng.GetState();
+        
+        # capacity setting, only in exclusion mode
+        extra = {} if self.capacity is None else {"capacity": np.asarray(self.capacity)};
+        
+        np.savez(fname,
+            E = np.array([r.E for r in rungs]),
+            occupancy = np.array([len(r.occupants) for r in rungs], dtype = np.int64),
+            stay = np.array([a.stay for a in agents], dtype = float),
+            up = np.array([a.up for a in agents], dtype = float),
+            name = np.array([a.name for a in agents], dtype = str),
+            t = self.t,
+            deltaE = self.deltaE,
+            **self.spec.Params(len(rungs) ),
+            **extra,
+            rng_state = rng_state,
+            rng_block = rng_block );
+            
+        #### end save
+        
     #### calculating properties of the system
     
     
                     
                     
 
+################################################################################
+# sparse ladder, only occupied rungs are kept
+################################################################################
+
+class sparseladder(object):
+    """
+    Like ladder, but rungs are only kept while something is on them. Rungs are
+    stored in a dict from level (0 at the bottom) to occupants list, so thin
+    upper tails don't leave long runs of empty rungs behind, and a time step
+    only visits occupied rungs. The top of the ladder can be left open, as in
+    ladder, or bounded at maxlevel with one of these policies for an up move
+    from the top rung:
+    - "reflecting", the particle bounces back down one rung
+    - "capped", the particle stays put, like a down move from the bottom rung
+    - "absorbing", the particle leaves the ladder and is kept in self.absorbed
+    The top level of a spectrum with a table is always capped, see spectra.spectrum.
+    """
+    
+    #### overloaded methods
+    
+    def __init__(self, maxlevel = None, policy = "capped", seed = None, bitgen = "PCG64", spec = None):
+        """
+        Args:
+        maxlevel, optional, int, level of the top rung, None for no top
+        policy, optional, string, "reflecting", "capped" or "absorbing", what
+            happens to an up move from the top rung, only used if maxlevel is set
+        seed, optional, seeds the random stream the agents draw from, see ladder
+        bitgen, optional, string, name of bit generator, see agent.BITGENS
+        spec, optional, spectra.spectrum, energy of each rung, see ladder
+        """
+        
+        # check bound
+        if( maxlevel is not None and maxlevel < 0 ):
+            raise ValueError("Cannot init sparseladder : maxlevel must be at least 0");
+        elif( policy not in ("reflecting", "capped", "absorbing") ):
+            raise ValueError("Cannot init sparseladder : policy must be reflecting, capped or absorbing");
+        elif( policy == "reflecting" and maxlevel == 0 ):
+            raise ValueError("Cannot init sparseladder : reflecting top needs maxlevel at least 1");
+        self.maxlevel = maxlevel;
+        self.policy = policy;
+        
+        # occupied rungs, maps level to list of agents on it
+        self.rungs = {};
+        self.absorbed = []; # agents that left through an absorbing top
+        
+        # how rungs correspond to energy
+        self.spec = spectra.Uniform() if spec is None else spec;
+        self.deltaE = self.spec.deltaE;
+        
+        # number of time steps taken so far
+        self.t = 0;
+        
+        # functions called as hook(ladder) at the end of each time step
+        self.hooks = [];
+        
+        # random numbers for agent decisions, drawn in blocks
+        if( isinstance(seed, agent.randomblock) ):
+            self.rng = seed;
+        else:
+            self.rng = agent.randomblock(seed, bitgen = bitgen);
+        
+        return; #### end init
+        
+    def __str__(self):
+        '''
+        String representation of the ladder, occupied rungs only
+        '''
+        
+        retlist = "";
+        for lev in sorted(self.rungs):
+            retlist += self.spec.Label(lev) + "[ "+str(len(self.rungs[lev]))+" ]\n";
+            
+        return retlist; #### end str
+        
+    #### basic access methods
+    
+    def N(self):
+        """
+        Quickly get how many total particles are in the ladder
+        """
+        
+        return sum([len(occ) for occ in self.rungs.values()]);
+        
+    def maxE(self):
+        """
+        Return the energy of the max occupied rung ( ie Fermi energy)
+        """
+        
+        return self.spec.Energy(max(self.rungs, default = 0) );
+        
+    def Levels(self):
+        """
+        Sparse occupancy, the occupied levels and the number on each
+        
+        Returns tuple of 1d np arrays of ints, (levels, counts), levels ascending
+        """
+        
+        levels = np.array(sorted(self.rungs), dtype = int);
+        counts = np.array([len(self.rungs[lev]) for lev in levels.tolist()], dtype = np.int64);
+        
+        return levels, counts; #### end levels
+        
+    def Occupancy(self):
+        """
+        Number of particles on each rung, bottom to highest occupied rung, same
+        as ladder.Occupancy so observers and recorders work unchanged
+        
+        Returns 1d np array of ints
+        """
+        
+        levels, counts = self.Levels();
+        occ = np.zeros(levels[-1]+1 if len(levels) else 1, dtype = np.int64);
+        occ[levels] = counts;
+        
+        return occ; #### end occupancy
+        
+    def Energies(self):
+        """
+        Energy of each rung, bottom to highest occupied rung
+        
+        Returns 1d np array of doubles
+        """
+        
+        return self.spec.Energies(len(self.Occupancy() )).copy();
+        
+    #### placement of particles on rung
+    
+    def Start(self, parts, level = 0):
+        """
+        start the particles on the lowest rung, or any other rung(s)
+        
+        Args:
+        parts: single agent or any iterable of agents (can be higher dimension also),
+            or an agent.population
+        level: optional, int rung to start every particle on, or sequence of ints
+            giving the starting rung of each particle, in the order of the
+            flattened parts
+        """
+        
+        parts = agent.Flatten(parts);
+        levels = np.zeros(len(parts), dtype = int);
+        levels[:] = level;
+        if( len(levels) and levels.min() < 0 ):
+            raise ValueError("Cannot start particles below the bottom rung");
+        elif( len(levels) and self.maxlevel is not None and levels.max() > self.maxlevel ):
+            raise ValueError("Cannot start particles above the top rung");
+        if( len(levels) ):
+            self.spec.Check(int(levels.max()) );
+            
+        for a, lev in zip(parts, levels.tolist() ):
+            self.rungs.setdefault(lev, []).append(a);
+            
+        #### end start
+        
+    def Dest(self, lev, delta):
+        """
+        Level a particle on rung lev ends up on after choosing delta (-1, 0, 1),
+        following the boundary rules
+        
+        Returns int level, or None if the particle was absorbed
+        """
+        
+        dest = lev + delta;
+        if( dest < 0 ): # down from the bottom rung means stay
+            return 0;
+        elif( self.maxlevel is not None and dest > self.maxlevel ):
+            if( self.policy == "capped" ):
+                return lev;
+            elif( self.policy == "reflecting" ):
+                return lev - 1;
+            else: # absorbing
+                return None;
+        elif( self.spec.Top() is not None and dest > self.spec.Top() ): # top of the spectrum is capped
+            return lev;
+                
+        return dest; #### end dest
+        
+    #### time evolution of the system
+    
+    def TimeStep(self):
+        """
+        This method enacts the change in the state of the system with one time step.
+        Each particle acts once, as in ladder.TimeStep. New occupants lists are
+        built for the step, so rungs that end up empty simply disappear.
+        """
+        
+        new = {};
+        for lev in sorted(self.rungs):
+            for a in self.rungs[lev]:
+                dest = self.Dest(lev, a.Act(self.rng) );
+                if( dest is None ):
+                    self.absorbed.append(a);
+                else:
+                    occ = new.get(dest);
+                    if( occ is None ):
+                        new[dest] = [a];
+                    else:
+                        occ.append(a);
+        self.rungs = new;
+        
+        # update step counter
+        self.t += 1;
+        
+        # let anything watching the run see the new state
+        for hook in self.hooks:
+            hook(self);
+            
+        #### end time step
+    
+    
+################################################################################
+# helpful functions that go with ladder class
+################################################################################
+
+def Load(fname, spec = None):
+    """
+    Load a ladder saved with ladder.Save(). The random stream is also restored,
+    so continuing the run gives the same result as if it had never stopped. The
+    agents come back as views into one agent.population.
+    
+    Args:
+    fname, string, file to load from
+    spec, optional, spectra.spectrum, spectrum of the saved ladder. Needed if
+        it was defined by a function, which can't be saved, otherwise the saved
+        spectrum is used
+    
+    Returns ladder object
+    """
+    
+    with np.load(fname) as f:
+    
+        # rebuild the rungs, files from before spectra were added are uniform
+        if( spec is None and "spectrum_kind" in f ):
+            spec = spectra.FromParams(f);
+        elif( spec is None ):
+            spec = spectra.Uniform(f["deltaE"].item() );
+        capacity = None;
+        if( "capacity" in f ):
+            capacity = f["capacity"].item() if f["capacity"].ndim == 0 else f["capacity"];
+        lad = ladder(spec = spec, capacity = capacity);
+        lad.start.content.E = f["E"][0].item();
+        for E in f["E"][1:]:
+            lad.append(rung(E.item(), []) );
+        
+        # rebuild the agents as a compact population and put them back on their rungs
+        name = f["name"];
+        if( len(name) and (name == name[0]).all() ): # shared name goes in side table once
+            name = str(name[0]);
+        else:
+            name = name.tolist();
+        pop = agent.population(len(f["stay"]), f["stay"], f["up"], names = name);
+        views = pop.Views();
+        i = 0;
+        for r, n in zip(lad.nodes, f["occupancy"].tolist() ):
+            r.content.occupants = views[i:i+n];
+            i += n;
+            
+        # other attributes
+        lad.Recount();
+        lad.t = f["t"].item();
+        
+        # random stream state
+        lad.rng.SetState(f["rng_state"].item(), f["rng_block"]);
+    
+    return lad; #### end load
+    
+
 ################################################################################
 # test code / wrapper functions
 ################################################################################
@@ -569,10 +1227,13 @@ def TimeStepTestCode():
     # make a ladder
     lad = ladder();
     
-    # place an interesting particle on the ladder
+    # place an interesting particle on the ladder, and watch it
     a1 = agent.agent(0,0.5, name = "verbose");
     a2 = agent.TestAgents(3); # add some other uninteresting agents
-    lad.Start((a1, a2));
+    pop = agent.population(3, 0.5, 0.3, names = "member"); # and a population
+    lad.Start((a1, a2, pop));
+    lad.Watch(a1, sink = print);
+    lad.Watch(pop[0]); # a fresh view of the same row, as Flatten makes
     
     # go over some time steps
     for t in range(50):
@@ -582,6 +1243,10 @@ def TimeStepTestCode():
         
     print(lad.N());
     print(lad.maxE() );
+    
+    # population member was followed too
+    t, positions, actions = lad.Trace();
+    print("rungs of "+pop[0].name+" (-1 if lost): "+str(positions[:, 1]) );
 
     return; ### end place test code
     
@@ -0,0 +1,282 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+master.py:
+This module solves the ladder exactly for agents that all share the same probs.
+A single particle then does a birth-death Markov chain on the rungs: each step it
+goes up with p = (1-stay)*up, down with q = (1-stay)*(1-up), and otherwise stays,
+with a down move from the bottom rung meaning stay (as in ladder.Place). The
+transition matrix is tridiagonal, so everything here is kept as three diagonals
+rather than a full matrix. The ladder has no top, so the chain is cut off once
+the probability left above the cut is below a tolerance.
+"""
+
+import numpy as np
+
+################################################################################
+# the transition matrix
+################################################################################
+
+def Rates(prob_stay, prob_up):
+    """
+    Single step probabilities of moving up and down
+
+    Args:
+    prob_stay, prob_up, doubles, choice probs of the agents, see agent.agent
+
+    Returns tuple of doubles, (p up, q down)
+    """
+
+    # check reasonability of probabilites
+    if( prob_stay > 1 or prob_stay < 0 ):
+        raise ValueError("prob stay must be 0 < prob_stay < 1");
+
+    elif( prob_up > 1 or prob_up < 0 ):
+        raise ValueError("prob up must be 0 < prob_up < 1");
+
+    return (1 - prob_stay)*prob_up, (1 - prob_stay)*(1 - prob_up); #### end rates
+
+def Truncation(prob_stay, prob_up, tol = 1e-12):
+    """
+    Number of rungs needed so that the stationary probability above the top one
+    is less than tol
+
+    Returns int
+    """
+
+    p, q = Rates(prob_stay, prob_up);
+    if( p >= q ):
+        raise ValueError("No stationary distribution for p up >= p down, the ladder grows forever");
+    if( p == 0 ):
+        return 1;
+
+    # tail above n rungs is (p/q)^n
+    return max(2, int(np.ceil(np.log(tol)/np.log(p/q) )) ); #### end truncation
+
+def TransitionMatrix(prob_stay, prob_up, nrungs):
+    """
+    Tridiagonal transition matrix P of the chain cut to nrungs rungs, where
+    P[i, j] is the prob to go from rung i to rung j in one step. A particle that
+    would leave the top rung stays instead, so each row still sums to 1.
+
+    Args:
+    prob_stay, prob_up, doubles, choice probs of the agents
+    nrungs, int, number of rungs to keep
+
+    Returns tuple of 1d np arrays (lower, diag, upper), where lower[i] = P[i+1, i],
+    diag[i] = P[i, i] and upper[i] = P[i, i+1]
+    """
+
+    p, q = Rates(prob_stay, prob_up);
+    diag = np.full(nrungs, prob_stay);
+    diag[0] += q; # down from the bottom rung means stay
+    diag[-1] += p; # cut off top
+    upper = np.full(nrungs - 1, p);
+    lower = np.full(nrungs - 1, q);
+
+    return lower, diag, upper; #### end transition matrix
+
+def Dense(lower, diag, upper):
+    """
+    Full matrix from the diagonals returned by TransitionMatrix
+
+    Returns 2d np array
+    """
+
+    return np.diag(diag) + np.diag(upper, 1) + np.diag(lower, -1); #### end dense
+
+def Step(v, lower, diag, upper):
+    """
+    Evolve a distribution over the rungs by one time step, v -> v P
+
+    Args:
+    v, 1d np array, prob of being on each rung
+    lower, diag, upper, diagonals of P as returned by TransitionMatrix
+
+    Returns 1d np array
+    """
+
+    new = v*diag;
+    new[1:] += v[:-1]*upper; # up movers
+    new[:-1] += v[1:]*lower; # down movers
+
+    return new; #### end step
+
+################################################################################
+# solutions
+################################################################################
+
+def Stationary(prob_stay, prob_up, tol = 1e-12):
+    """
+    Stationary distribution over the rungs. Detailed balance between rungs i and
+    i+1 gives pi[i+1]/pi[i] = p/q, so it is geometric, ie Boltzmann with
+    temperature given by Temperature(). It does not depend on prob_stay.
+
+    Args:
+    prob_stay, prob_up, doubles, choice probs of the agents
+    tol, optional, double, prob left above the top rung kept
+
+    Returns 1d np array, prob of being on each rung
+    """
+
+    p, q = Rates(prob_stay, prob_up);
+    n = Truncation(prob_stay, prob_up, tol);
+    pi = (p/q)**np.arange(n);
+
+    return pi/pi.sum(); #### end stationary
+
+def Temperature(prob_stay, prob_up, deltaE = 1):
+    """
+    Temperature of the stationary distribution, from p/q = exp(-deltaE/T), k_B = 1
+
+    Returns double
+    """
+
+    p, q = Rates(prob_stay, prob_up);
+    if( p >= q ):
+        raise ValueError("No stationary distribution for p up >= p down, the ladder grows forever");
+    if( p == 0 ):
+        return 0.0;
+
+    return -deltaE/np.log(p/q); #### end temperature
+
+def RelaxationTime(prob_stay, prob_up, tol = 1e-12, nrungs = None):
+    """
+    Number of steps for the distribution to relax to the stationary one, from
+    the second largest eigenvalue magnitude lam of P, tau = -1/ln(lam). The chain
+    obeys detailed balance, so P is similar to a symmetric tridiagonal matrix
+    with off diagonal sqrt(p q). With both ends reflecting its eigenvalues are
+    known in closed form, 1 and prob_stay + 2 sqrt(p q) cos(pi k/nrungs) for
+    k = 1 ... nrungs-1, so no matrix is needed.
+
+    Args:
+    prob_stay, prob_up, doubles, choice probs of the agents
+    tol, optional, double, sets the number of rungs kept, see Truncation
+    nrungs, optional, int, number of rungs kept, overrides tol
+
+    Returns double, relaxation time in time steps
+    """
+
+    p, q = Rates(prob_stay, prob_up);
+    if( nrungs is None ):
+        nrungs = Truncation(prob_stay, prob_up, tol);
+    if( nrungs < 2 or p == 0 ):
+        return 0.0;
+
+    # largest is 1, the stationary distribution, the next largest in magnitude
+    # is at k = 1 or k = nrungs-1, for 2 rungs the cos is exactly 0
+    c = 2*np.sqrt(p*q)*np.cos(np.pi/nrungs) if nrungs > 2 else 0.0;
+    lam = max(abs(prob_stay + c), abs(prob_stay - c) );
+    if( lam == 0 ):
+        return 0.0;
+
+    return -1/np.log(lam); #### end relaxation time
+
+def Evolve(prob_stay, prob_up, t, v0 = None, tol = 1e-12):
+    """
+    Distribution over the rungs after t time steps. The ladder can only grow one
+    rung per step, and a new rung is added only once the prob on the top rung
+    is above tol, so the cost is t times the number of rungs that matter.
+
+    Args:
+    prob_stay, prob_up, doubles, choice probs of the agents
+    t, int, number of time steps
+    v0, optional, 1d np array, starting distribution, defaults to all on the
+        bottom rung as after ladder.Start
+    tol, optional, double, prob on the top rung at which the ladder grows
+
+    Returns 1d np array, prob of being on each rung
+    """
+
+    p, q = Rates(prob_stay, prob_up);
+    if( v0 is None ):
+        v = np.ones(1);
+    else:
+        v = np.array(v0, dtype = float);
+    stay = np.full(len(v), prob_stay); # diagonal without the boundary terms
+
+    for step in range(t):
+
+        # grow if the top rung holds enough prob to spill over
+        if( v[-1]*p > tol ):
+            v = np.append(v, 0.0);
+            stay = np.append(stay, prob_stay);
+
+        # v -> v P, with the top of v open so prob can move into the new rung
+        new = v*stay;
+        new[0] += v[0]*q; # down from the bottom rung means stay
+        new[1:] += v[:-1]*p; # up movers
+        new[:-1] += v[1:]*q; # down movers
+        new[-1] += v[-1]*p; # only reached when below tol, keep the prob
+        v = new;
+
+    return v; #### end evolve
+
+def Expected(N, prob_stay, prob_up, nrungs = None, t = None, tol = 1e-12):
+    """
+    Expected number of particles on each rung, for comparing to the Occupancy()
+    of a simulated ladder of N particles started on the bottom rung
+
+    Args:
+    N, int, number of particles
+    prob_stay, prob_up, doubles, choice probs of the agents
+    nrungs, optional, int, length of the result, eg len(lad.Occupancy()). Rungs
+        above the solution are zero, prob above nrungs is dropped
+    t, optional, int, number of time steps, if None the stationary distribution
+    tol, optional, double, see Stationary and Evolve
+
+    Returns 1d np array of doubles
+    """
+
+    if( t is None ):
+        v = Stationary(prob_stay, prob_up, tol);
+    else:
+        v = Evolve(prob_stay, prob_up, t, tol = tol);
+
+    if( nrungs is not None ):
+        v = np.concatenate((v, np.zeros(max(0, nrungs - len(v)) )) )[:nrungs];
+
+    return N*v; #### end expected
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def MasterTestCode(N = 10000, nsteps = 100):
+
+    import fastladder
+
+    prob_stay, prob_up = 0.5, 0.3;
+
+    # simulate
+    lad = fastladder.countladder(prob_stay, prob_up, seed = 0);
+    lad.Start(N);
+    for t in range(nsteps):
+        lad.TimeStep();
+    occ = lad.Occupancy();
+
+    # compare to exact
+    print("simulated: "+str(occ) );
+    print("exact:     "+str(np.round(Expected(N, prob_stay, prob_up, len(occ), t = nsteps), 1)) );
+    print("T = "+str(Temperature(prob_stay, prob_up)) );
+    print("relaxation time = "+str(RelaxationTime(prob_stay, prob_up)) );
+
+    return; #### end master test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    MasterTestCode();
@@ -0,0 +1,431 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+observables.py:
+This module calculates thermodynamic properties of the ladder as it runs. Running
+averages are updated once per time step with Welford's method, so memory only
+grows with the number of rungs, never the number of steps. The temperature is
+found by fitting the log of the average occupancy of each rung against its
+energy, as expected for a Boltzmann distribution n(E) ~ g exp(-E/T), with k_B = 1
+and g the degeneracy of the rung.
+"""
+
+import numpy as np
+
+################################################################################
+# define the observer class
+################################################################################
+
+class observer(object):
+    """
+    Keeps running averages of the state of a ladder. Call Update(lad) once per
+    time step, or Attach(lad) to have the ladder do it through its hooks.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, nblocks = 64):
+        """
+        Args:
+        nblocks, optional, int, max number of blocks kept for the block average
+            error estimate of the mean energy, must be even
+        """
+
+        # check reasonability of nblocks
+        if( nblocks < 4 or nblocks % 2 ):
+            raise ValueError("Cannot init observer : nblocks must be even and at least 4");
+        self.nblocks = nblocks;
+
+        self.Reset();
+
+        return; #### end init
+
+    def __call__(self, lad):
+        """
+        Lets the observer be used directly as a ladder hook
+        """
+
+        self.Update(lad); #### end call
+
+    def __str__(self):
+        """
+        String rep of the observer, summary of the current estimates
+        """
+
+        rep = self.Report();
+        pstring = "";
+        for key in ("steps", "mean_E", "err_E", "var_E", "T", "err_T", "C"):
+            pstring += key+" = "+str(rep[key])+"\n";
+
+        return pstring; #### end str
+
+    #### updating
+
+    def Reset(self):
+        """
+        Throw away everything seen so far, for example after burn in
+        """
+
+        # number of steps seen
+        self.steps = 0;
+
+        # mean energy per particle and total energy fluctuations, Welford style
+        self.meanE = 0.0; # running mean of energy per particle
+        self.M2 = 0.0; # sum of squared deviations of energy per particle
+        self.meanEtot = 0.0; # running mean of total energy
+        self.M2tot = 0.0; # sum of squared deviations of total energy
+        self.N = 0; # number of particles at last update
+
+        # occupancy of each rung
+        self.occ = np.zeros(0); # running mean
+        self.occM2 = np.zeros(0); # sum of squared deviations
+        self.E = np.zeros(0); # energy of each rung
+        self.g = np.zeros(0); # degeneracy of each rung
+
+        # block averages of energy per particle, for an error bar that accounts
+        # for correlation between steps. Blocks hold sums of blocksize steps
+        self.blocksize = 1;
+        self.blocks = []; # finished block sums
+        self.current = 0.0; # sum in block being filled
+        self.incurrent = 0; # number of steps in block being filled
+
+        #### end reset
+
+    def Attach(self, lad):
+        """
+        Hook the observer into a ladder, so that it updates after each TimeStep
+
+        Args:
+        lad, ladder object (or any of the fastladder engines)
+        """
+
+        lad.hooks.append(self); #### end attach
+
+    def Update(self, lad):
+        """
+        Add the current state of the ladder to the running averages
+
+        Args:
+        lad, ladder object, or anything else with Occupancy() and Energies() methods
+        """
+
+        occ = lad.Occupancy();
+        E = lad.Energies();
+        self.steps += 1;
+
+        # widen per rung arrays if the ladder grew, new rungs had zero occupancy
+        # at every earlier step so their mean is 0 and the deviations of the
+        # earlier steps, (0 - 0)^2, are 0 as well
+        if( len(occ) > len(self.occ) ):
+            self.occ = np.concatenate((self.occ, np.zeros(len(occ) - len(self.occ)) ) );
+            self.occM2 = np.concatenate((self.occM2, np.zeros(len(occ) - len(self.occM2)) ) );
+            self.E = E.copy();
+            spec = getattr(lad, "spec", None);
+            self.g = np.ones(len(E)) if spec is None else spec.Degeneracies(len(E)).astype(float);
+
+        # occupancy, Welford update of every rung at once
+        delta = occ - self.occ[:len(occ)];
+        self.occ[:len(occ)] += delta/self.steps;
+        self.occM2[:len(occ)] += delta*(occ - self.occ[:len(occ)]);
+        if( len(occ) < len(self.occ) ): # engines that don't report empty top rungs
+            delta = -self.occ[len(occ):];
+            self.occ[len(occ):] += delta/self.steps;
+            self.occM2[len(occ):] += delta*(-self.occ[len(occ):]);
+
+        # energies
+        self.N = int(occ.sum() );
+        Etot = float(np.dot(occ, E) );
+        Epp = Etot/max(self.N, 1);
+        delta = Epp - self.meanE;
+        self.meanE += delta/self.steps;
+        self.M2 += delta*(Epp - self.meanE);
+        delta = Etot - self.meanEtot;
+        self.meanEtot += delta/self.steps;
+        self.M2tot += delta*(Etot - self.meanEtot);
+
+        # block averages, when the block list is full pairs are merged and the
+        # block size doubles, so the number of blocks stays bounded
+        self.current += Epp;
+        self.incurrent += 1;
+        if( self.incurrent == self.blocksize ):
+            self.blocks.append(self.current);
+            self.current = 0.0;
+            self.incurrent = 0;
+            if( len(self.blocks) == self.nblocks ):
+                self.blocks = [self.blocks[i] + self.blocks[i+1] for i in range(0, self.nblocks, 2)];
+                self.blocksize *= 2;
+
+        #### end update
+
+    #### estimates
+
+    def VarE(self):
+        """
+        Returns double, variance of the energy per particle over the steps seen
+        """
+
+        if( self.steps < 2 ):
+            return 0.0;
+        return self.M2/(self.steps - 1); #### end var E
+
+    def ErrE(self):
+        """
+        Error bar on the mean energy per particle, from the spread of the block
+        averages so that correlation between steps is accounted for. Any leftover
+        correlation between neighboring blocks widens the error further.
+
+        Returns double, standard error of the mean, inf if too few blocks
+        """
+
+        if( len(self.blocks) < 4 ):
+            return float("inf");
+        means = np.array(self.blocks)/self.blocksize;
+        err = means.std(ddof = 1)/np.sqrt(len(means) );
+        return float(err*np.sqrt(Inefficiency(means)) ); #### end err E
+
+    def OccupancyVar(self):
+        """
+        Returns 1d np array, variance of the occupancy of each rung
+        """
+
+        if( self.steps < 2 ):
+            return np.zeros(len(self.occ) );
+        return self.occM2/(self.steps - 1); #### end occupancy var
+
+    def Temperature(self):
+        """
+        Fit log(average occupancy/degeneracy) = a - E/T over the occupied rungs,
+        weighting each rung by its average occupancy since the relative error of
+        a count n goes like 1/sqrt(n)
+
+        Returns tuple of doubles, (T, error on T). T is inf if the fit slope is
+        not negative, nan if there are fewer than two occupied rungs
+        """
+
+        return FitTemperature(self.occ, self.E, self.g); #### end temperature
+
+    def HeatCapacity(self):
+        """
+        Heat capacity from the fluctuations of the total energy, C = var(E)/T^2
+
+        Returns double
+        """
+
+        T = self.Temperature()[0];
+        if( self.steps < 2 or not np.isfinite(T) ):
+            return float("nan");
+        return self.M2tot/(self.steps - 1)/T**2; #### end heat capacity
+
+    def Converged(self, rtol = 1e-3):
+        """
+        Whether the mean energy per particle is known to within rtol relative
+        error, so that the run can stop
+
+        Args:
+        rtol, optional, double, target relative error
+
+        Returns bool
+        """
+
+        return self.ErrE() <= rtol*abs(self.meanE); #### end converged
+
+    def Report(self):
+        """
+        Returns dict of the current estimates
+        """
+
+        T, errT = self.Temperature();
+        return {"steps": self.steps, "N": self.N, "mean_E": self.meanE,
+            "err_E": self.ErrE(), "var_E": self.VarE(), "T": T, "err_T": errT,
+            "C": self.HeatCapacity(), "occupancy": self.occ.copy(),
+            "occupancy_var": self.OccupancyVar()}; #### end report
+
+
+################################################################################
+# running until equilibrium
+################################################################################
+
+def FitTemperature(occ, E, g = None):
+    """
+    Fit log(occupancy/degeneracy) = a - E/T over the occupied rungs, weighting
+    each rung by its occupancy since the relative error of a count n goes like
+    1/sqrt(n)
+
+    Args:
+    occ, 1d np array, (average) number of particles on each rung
+    E, 1d np array, energy of each rung
+    g, optional, 1d np array, degeneracy of each rung, defaults to all 1
+
+    Returns tuple of doubles, (T, error on T). T is inf if the fit slope is
+    not negative, nan if there are fewer than two occupied rungs
+    """
+
+    occ = np.asarray(occ, dtype = float);
+    if( g is None ):
+        g = np.ones(len(occ) );
+    mask = occ > 0;
+    if( mask.sum() < 2 ):
+        return float("nan"), float("nan");
+
+    # weighted least squares for the slope of log occupancy per state against energy
+    x, y, w = E[mask], np.log(occ[mask]/g[mask]), occ[mask];
+    xbar = np.dot(w, x)/w.sum();
+    ybar = np.dot(w, y)/w.sum();
+    Sxx = np.dot(w, (x - xbar)**2);
+    slope = np.dot(w, (x - xbar)*(y - ybar))/Sxx;
+    if( slope >= 0 ):
+        return float("inf"), float("nan");
+
+    # slope error from the weighted residuals, propagated to T = -1/slope
+    resid = y - ybar - slope*(x - xbar);
+    if( mask.sum() > 2 ):
+        errslope = np.sqrt(np.dot(w, resid**2)/(mask.sum() - 2)/Sxx);
+    else:
+        errslope = 0.0;
+    T = -1/slope;
+
+    return float(T), float(errslope*T**2); #### end fit temperature
+
+def Inefficiency(x):
+    """
+    Statistical inefficiency g of a correlated series, the factor by which
+    correlation inflates the variance of its mean, from its lag 1 correlation r
+    assuming the correlation decays exponentially: g = (1 + r)/(1 - r)
+
+    Args:
+    x, 1d np array, the series
+
+    Returns double, g >= 1
+    """
+
+    dx = x - x.mean();
+    var = np.dot(dx, dx);
+    if( len(x) < 3 or var == 0 ):
+        return 1.0;
+    r = np.dot(dx[:-1], dx[1:])/var;
+    r = min(max(r, 0.0), 0.99); # anticorrelation would only shrink the error
+
+    return (1 + r)/(1 - r); #### end inefficiency
+
+def Equilibrate(lad, window = 100, nagree = 3, nsigma = 2.0, maxsteps = 10**6):
+    """
+    Step the ladder until it has equilibrated. The energy per particle is
+    averaged over consecutive windows of steps, and the ladder is taken to be
+    in equilibrium once nagree windows in a row each agree with the one before
+    within nsigma combined error bars, ie the energy has stopped drifting.
+
+    Args:
+    lad, ladder object (or any of the fastladder engines)
+    window, optional, int, number of steps in each window
+    nagree, optional, int, number of agreeing windows in a row needed
+    nsigma, optional, double, how many error bars apart windows can be
+    maxsteps, optional, int, give up after this many steps
+
+    Returns int, number of steps taken, ie the burn in to discard. Raises
+    RuntimeError if the ladder did not equilibrate within maxsteps
+    """
+
+    E = lad.Energies(); # refreshed only when the ladder grows
+    last = None; # (mean, error) of previous window
+    agree = 0;
+    steps = 0;
+    while( steps < maxsteps ):
+
+        # energy per particle over one window
+        series = np.empty(window);
+        for t in range(window):
+            lad.TimeStep();
+            occ = lad.Occupancy();
+            if( len(occ) != len(E) ):
+                E = lad.Energies();
+            series[t] = np.dot(occ, E)/max(occ.sum(), 1);
+        steps += window;
+
+        # compare to previous window
+        mean = series.mean();
+        err = series.std(ddof = 1)*np.sqrt(Inefficiency(series)/window);
+        if( last is not None ):
+            if( abs(mean - last[0]) <= nsigma*np.sqrt(err**2 + last[1]**2) ):
+                agree += 1;
+            else:
+                agree = 0;
+            if( agree >= nagree ):
+                return steps;
+        last = (mean, err);
+
+    raise RuntimeError("Ladder did not equilibrate in "+str(maxsteps)+" steps");
+
+    #### end equilibrate
+
+def Run(lad, rtol = 1e-3, window = 100, minsteps = 1000, maxsteps = 10**6):
+    """
+    Equilibrate the ladder, throw away the burn in, then collect samples with an
+    observer until the mean energy per particle is known to relative error rtol.
+
+    Args:
+    lad, ladder object (or any of the fastladder engines)
+    rtol, optional, double, target relative error on the mean energy
+    window, optional, int, window size used by Equilibrate
+    minsteps, optional, int, fewest sampling steps, so that the error estimate
+        itself has settled before it is trusted
+    maxsteps, optional, int, max steps for each of equilibrating and sampling
+
+    Returns tuple of (observer, int burn in steps). If the error target was not
+    reached within maxsteps the observer is returned anyway, check
+    observer.Converged(rtol)
+    """
+
+    burnin = Equilibrate(lad, window = window, maxsteps = maxsteps);
+
+    # sample
+    obs = observer();
+    lad.hooks.append(obs);
+    try:
+        while( obs.steps < maxsteps ):
+            lad.TimeStep();
+            if( obs.steps >= minsteps and obs.Converged(rtol) ):
+                break;
+    finally:
+        lad.hooks.remove(obs);
+
+    return obs, burnin; #### end run
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def ObserverTestCode():
+
+    import fastladder
+
+    # make a ladder
+    lad = fastladder.countladder(0.5, 0.3, seed = 0);
+    lad.Start(10000);
+
+    # let it equilibrate, then run until the energy is known well enough
+    obs, burnin = Run(lad, rtol = 1e-3);
+    print("burn in = "+str(burnin) );
+    print(obs);
+
+    # compare to T expected from detailed balance, p_up/p_down = exp(-deltaE/T)
+    print("expected T = "+str(-lad.deltaE/np.log(0.3/0.7)) );
+
+    return; #### end observer test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    ObserverTestCode();
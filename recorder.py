@@ -0,0 +1,267 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+recorder.py:
+This module records the occupancy of each rung at each time step straight to
+disk, in a memory mapped .npy file that grows as the run goes on. The file can be
+read back lazily with Load(), so long trajectories never have to fit in memory.
+"""
+
+import numpy as np
+import os
+
+# size in bytes of the .npy header we write, kept fixed so the header can be
+# rewritten in place whenever the shape of the recorded array changes
+HEADER_LEN = 128;
+
+################################################################################
+# define the recorder class
+################################################################################
+
+class recorder(object):
+    """
+    Writes one row per time step, holding the number of particles on each rung,
+    to a 2d int64 array on disk. Rows are added by growing the file, and when the
+    ladder grows past the width of the array, the array is rewritten wider with
+    zeros for the new rungs at earlier times.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, fname, nrungs = 16, nsteps = 1024):
+        """
+        Args:
+        fname, string, .npy file to record to, overwritten if it exists
+        nrungs, optional, int, number of rungs to make room for at first
+        nsteps, optional, int, number of time steps to make room for at first
+        """
+
+        # check reasonability of sizes
+        if( nrungs < 1 or nsteps < 1 ):
+            raise ValueError("Cannot init recorder : nrungs and nsteps must be at least 1");
+
+        # file attributes
+        self.fname = fname;
+        self.width = nrungs; # number of columns (rungs) in the array
+        self.capacity = nsteps; # number of rows (steps) there is room for
+        self.n = 0; # number of rows recorded so far
+
+        # create the file and map it
+        with open(self.fname, "wb") as f:
+            WriteHeader(f, (0, self.width) );
+            f.truncate(HEADER_LEN + 8*self.capacity*self.width);
+        self.Map();
+
+        return; #### end init
+
+    def __call__(self, lad):
+        """
+        Lets the recorder be used directly as a ladder hook
+        """
+
+        self.Record(lad); #### end call
+
+    def __len__(self):
+        """
+        Number of time steps recorded
+        """
+
+        return self.n;
+
+    #### writing to disk
+
+    def Map(self):
+        """
+        (Re)create the memory map over the data part of the file
+        """
+
+        self.data = np.memmap(self.fname, dtype = "<i8", mode = "r+", offset = HEADER_LEN,
+            shape = (self.capacity, self.width) );
+
+        #### end map
+
+    def Attach(self, lad):
+        """
+        Hook the recorder into a ladder, so that it records after each TimeStep
+
+        Args:
+        lad, ladder object (or any of the fastladder engines)
+        """
+
+        lad.hooks.append(self); #### end attach
+
+    def Record(self, lad):
+        """
+        Add the current occupancy of the ladder as a new row
+
+        Args:
+        lad, ladder object, or anything else with an Occupancy() method
+        """
+
+        occ = lad.Occupancy();
+
+        # make room if needed
+        if( len(occ) > self.width ):
+            self.Widen(max(len(occ), 2*self.width) );
+        if( self.n == self.capacity ):
+            self.Grow(2*self.capacity);
+
+        # write the row
+        self.data[self.n, :len(occ)] = occ;
+        self.n += 1;
+
+        #### end record
+
+    def Grow(self, nsteps):
+        """
+        Make room for more time steps by extending the file
+
+        Args:
+        nsteps, int, new number of rows there is room for
+        """
+
+        self.data.flush();
+        del self.data;
+        with open(self.fname, "r+b") as f:
+            f.truncate(HEADER_LEN + 8*nsteps*self.width);
+        self.capacity = nsteps;
+        self.Map();
+
+        #### end grow
+
+    def Widen(self, nrungs):
+        """
+        Make room for more rungs by rewriting the array with more columns. Only
+        happens when the ladder outgrows the array, so doubling the width keeps
+        the total cost of rewriting small.
+
+        Args:
+        nrungs, int, new number of columns
+        """
+
+        # write the wider array to a new file, a block of rows at a time
+        tmpname = self.fname+".tmp";
+        with open(tmpname, "wb") as f:
+            WriteHeader(f, (0, nrungs) );
+            f.truncate(HEADER_LEN + 8*self.capacity*nrungs);
+        new = np.memmap(tmpname, dtype = "<i8", mode = "r+", offset = HEADER_LEN,
+            shape = (self.capacity, nrungs) );
+        block = max(1, 2**20//self.width);
+        for i in range(0, self.n, block):
+            new[i:i+block, :self.width] = self.data[i:i+block];
+        new.flush();
+        del new;
+
+        # swap in the new file
+        del self.data;
+        os.replace(tmpname, self.fname);
+        self.width = nrungs;
+        self.Map();
+
+        #### end widen
+
+    def Flush(self):
+        """
+        Make the file on disk a valid .npy file holding every row recorded so far
+        """
+
+        self.data.flush();
+        with open(self.fname, "r+b") as f:
+            WriteHeader(f, (self.n, self.width) );
+
+        #### end flush
+
+    def Close(self):
+        """
+        Flush, and trim the file down to the rows actually recorded
+        """
+
+        self.Flush();
+        del self.data;
+        with open(self.fname, "r+b") as f:
+            f.truncate(HEADER_LEN + 8*self.n*self.width);
+
+        #### end close
+
+
+################################################################################
+# helpful functions that go with recorder class
+################################################################################
+
+def WriteHeader(f, shape):
+    """
+    Write a version 1.0 .npy header for a C ordered int64 array, padded out to
+    HEADER_LEN bytes, at the start of the file
+
+    Args:
+    f, open binary file
+    shape, tuple of ints, shape of the array
+    """
+
+    # header dict, padded with spaces and ending in newline as per the format
+    header = "{'descr': '<i8', 'fortran_order': False, 'shape': "+str(tuple(shape))+", }";
+    header += " "*(HEADER_LEN - 10 - len(header) - 1) + "\n";
+    if( len(header) != HEADER_LEN - 10 ):
+        raise ValueError("Shape "+str(shape)+" too large for recorder header");
+
+    f.seek(0);
+    f.write(b"\x93NUMPY\x01\x00" + np.uint16(len(header)).tobytes() + header.encode("latin1") );
+
+    #### end write header
+
+def Load(fname):
+    """
+    Lazily load a recorded trajectory
+
+    Args:
+    fname, string, file written by a recorder
+
+    Returns 2d np memmap, row t is the occupancy of each rung after step t
+    """
+
+    return np.load(fname, mmap_mode = "r"); #### end load
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def RecorderTestCode(fname = "occupancy.npy", nsteps = 1000):
+
+    import agent
+    import ladder
+
+    # make a ladder and record it
+    lad = ladder.ladder();
+    lad.Start(agent.agent(0.5, 0.4) for i in range(100) );
+    rec = recorder(fname, nrungs = 2, nsteps = 16);
+    rec.Attach(lad);
+
+    # go over some time steps
+    for t in range(nsteps):
+        lad.TimeStep();
+    rec.Close();
+
+    # read back the last few steps
+    traj = Load(fname);
+    print(traj.shape);
+    print(traj[-5:]);
+
+    return; #### end recorder test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    RecorderTestCode();
@@ -0,0 +1,336 @@
+"""
+Created Sept 8, 2020
+@author: Christian Bunker
+
+Boltzmann ladder project:
+In this project, I create a simple agent based model of particles moving up and
+down a ladder. My aim is to connect this model to statistical mechanics by drawing
+parallels between particle speed and temperature, and between rungs and energy
+levels. Successful recreation of the Boltzmann distribution in this model could
+offer insights into the interpretation of the distribution.
+
+spectra.py:
+This module defines the energy spectrum of the ladder, ie the energy and
+degeneracy of each rung. Energies are computed once per level and cached in
+arrays that grow with the ladder, so anything needing the energies of all the
+rungs gets an array slice rather than walking the rungs.
+"""
+
+import numpy as np
+
+################################################################################
+# define the spectrum class
+################################################################################
+
+class spectrum(object):
+    """
+    Energy and degeneracy of each level (rung), level 0 is the bottom. Built in
+    kinds of spectrum:
+    - "uniform", E = deltaE*level, the original ladder
+    - "harmonic", E = deltaE*(level + 1/2), quantum harmonic oscillator
+    - "quadratic", E = deltaE*level^2, particle in a box
+    - "table", energies given in a table
+    or kind can be a function of an int array of levels returning their energies.
+    A table of energies or of degeneracies gives the spectrum a top level, see
+    Top, and every ladder treats it as a capped top: an up move from the top
+    level is rejected and the particle stays put.
+    """
+
+    #### overloaded methods
+
+    def __init__(self, kind = "uniform", deltaE = 1, table = None, degeneracy = None):
+        """
+        Args:
+        kind, optional, string or function, see above
+        deltaE, optional, double, energy scale of the built in kinds
+        table, optional, 1d array of doubles, energies for kind "table"
+        degeneracy, optional, None (all 1), function of an int array of levels
+            returning their degeneracies, or 1d array of ints, one per level
+        """
+
+        # check kind
+        if( kind == "table" ):
+            if( table is None or len(table) == 0 ):
+                raise ValueError("Cannot init spectrum : table kind needs a table of energies");
+        elif( not callable(kind) and kind not in ("uniform", "harmonic", "quadratic") ):
+            raise ValueError("Cannot init spectrum : unknown kind "+str(kind) );
+
+        # set attributes
+        self.kind = kind;
+        self.deltaE = deltaE;
+        self.table = None if table is None else np.array(table, dtype = float);
+        self.degeneracy = degeneracy;
+
+        # highest level, None if the spectrum goes on forever
+        self.top = None;
+        if( kind == "table" ):
+            self.top = len(self.table) - 1;
+        if( degeneracy is not None and not callable(degeneracy) ):
+            self.top = len(degeneracy) - 1 if self.top is None else min(self.top, len(degeneracy) - 1);
+
+        # caches, grown by Extend
+        self.E = np.zeros(0); # energy of each level
+        self.g = np.zeros(0, dtype = np.int64); # degeneracy of each level
+        self.weights = {}; # maps temperature to Boltzmann weights g*exp(-E/T)
+        self.Extend(1);
+
+        return; #### end init
+
+    def __repr__(self):
+
+        return "spectrum("+str(self.kind if not callable(self.kind) else "custom")+")";
+
+    #### filling the caches
+
+    def Extend(self, n):
+        """
+        Make sure the caches hold at least n levels, doubling their size so that
+        a growing ladder only extends them now and then
+
+        Args:
+        n, int, number of levels needed
+        """
+
+        if( n <= len(self.E) ):
+            return;
+
+        # new levels, tables can't be extended past their end
+        size = max(n, 2*len(self.E) );
+        for table in (self.table if self.kind == "table" else None, None if callable(self.degeneracy) else self.degeneracy):
+            if( table is not None ):
+                if( n > len(table) ):
+                    raise IndexError("Spectrum table only has "+str(len(table))+" levels, needed "+str(n) );
+                size = min(size, len(table) );
+        levels = np.arange(len(self.E), size);
+
+        # energies
+        if( self.kind == "uniform" ):
+            E = self.deltaE*levels;
+        elif( self.kind == "harmonic" ):
+            E = self.deltaE*(levels + 0.5);
+        elif( self.kind == "quadratic" ):
+            E = self.deltaE*levels**2;
+        elif( self.kind == "table" ):
+            E = self.table[levels];
+        else: # user function
+            E = self.kind(levels);
+
+        # degeneracies
+        if( self.degeneracy is None ):
+            g = np.ones(len(levels), dtype = np.int64);
+        elif( callable(self.degeneracy) ):
+            g = self.degeneracy(levels);
+        else:
+            g = np.asarray(self.degeneracy)[levels];
+
+        self.E = np.concatenate((self.E, np.asarray(E, dtype = float)) );
+        self.g = np.concatenate((self.g, np.asarray(g, dtype = np.int64)) );
+        self.weights = {}; # recomputed on demand at the new size
+
+        #### end extend
+
+    #### access
+
+    def Top(self):
+        """
+        Returns int, highest level, or None if there is no top
+        """
+
+        return self.top; #### end top
+
+    def Check(self, level):
+        """
+        Make sure particles can be put on the given level, raising ValueError if
+        it is above the top of the spectrum
+
+        Args:
+        level, int, highest level particles will be put on
+        """
+
+        if( self.top is not None and level > self.top ):
+            raise ValueError("Cannot start particles on level "+str(level)+", the spectrum's top level is "+str(self.top) );
+
+        #### end check
+
+    def Energy(self, level):
+        """
+        Returns double, energy of one level
+        """
+
+        self.Extend(level + 1);
+        return float(self.E[level]); #### end energy
+
+    def Energies(self, n):
+        """
+        Returns 1d np array of doubles, energies of the first n levels
+        """
+
+        self.Extend(n);
+        return self.E[:n]; #### end energies
+
+    def Degeneracies(self, n):
+        """
+        Returns 1d np array of ints, degeneracies of the first n levels
+        """
+
+        self.Extend(n);
+        return self.g[:n]; #### end degeneracies
+
+    def Label(self, level):
+        """
+        Returns string, "E = ..." for one level padded to line up the rungs when
+        a ladder is printed
+        """
+
+        label = "E = %g" % self.Energy(level);
+        return label + " "*(7-len(label) ); #### end label
+
+    def Weights(self, T, n):
+        """
+        Boltzmann weights g*exp(-E/T) of the first n levels, cached per
+        temperature, k_B = 1. Not normalized, see Boltzmann for that
+
+        Args:
+        T, double, temperature
+        n, int, number of levels
+
+        Returns 1d np array of doubles
+        """
+
+        self.Extend(n);
+        w = self.weights.get(T);
+        if( w is None ):
+            w = self.g*np.exp(-(self.E - self.E[0])/T); # measured from the bottom to avoid underflow
+            self.weights[T] = w;
+
+        return w[:n]; #### end weights
+
+    def Boltzmann(self, T, n):
+        """
+        Boltzmann distribution over the first n levels
+
+        Returns 1d np array of doubles summing to 1
+        """
+
+        w = self.Weights(T, n);
+        return w/w.sum(); #### end boltzmann
+
+    #### saving
+
+    def Params(self, n):
+        """
+        Arrays needed to rebuild this spectrum with FromParams. Functions can't
+        be saved, so a spectrum with a user function for kind or degeneracy is
+        only marked as kind "function", and has to be given again when loading.
+
+        Returns dict of np arrays
+        """
+
+        self.Extend(n);
+        if( callable(self.kind) or callable(self.degeneracy) ):
+            return {"spectrum_kind": "function", "spectrum_deltaE": self.deltaE};
+
+        params = {"spectrum_kind": self.kind, "spectrum_deltaE": self.deltaE};
+        if( self.table is not None ):
+            params["spectrum_table"] = self.table;
+        if( self.degeneracy is not None ):
+            params["spectrum_degeneracy"] = np.asarray(self.degeneracy);
+
+        return params; #### end params
+
+
+################################################################################
+# helpful functions that go with spectrum class
+################################################################################
+
+def FromParams(f):
+    """
+    Rebuild a spectrum from the arrays returned by spectrum.Params. Raises
+    ValueError for a spectrum defined by a function, which wasn't saved
+
+    Args:
+    f, dict like, eg an open np.load file
+
+    Returns spectrum object
+    """
+
+    kind = str(f["spectrum_kind"]);
+    if( kind == "function" ):
+        raise ValueError("Cannot rebuild spectrum : it was defined by a function, which can't be saved, so it has to be given again (eg ladder.Load(fname, spec = ...))");
+    table = f["spectrum_table"] if "spectrum_table" in f else None;
+    degeneracy = f["spectrum_degeneracy"] if "spectrum_degeneracy" in f else None;
+    deltaE = f["spectrum_deltaE"].item() if isinstance(f["spectrum_deltaE"], np.ndarray) else f["spectrum_deltaE"];
+
+    return spectrum(kind, deltaE, table = table, degeneracy = degeneracy); #### end from params
+
+def Uniform(deltaE = 1):
+    """
+    Returns the spectrum of the original ladder, E = deltaE*level
+    """
+
+    return spectrum("uniform", deltaE); #### end uniform
+
+def Capacities(capacity, spec, n):
+    """
+    Most particles each of the first n levels can hold, for ladders in exclusion
+    mode. Levels above the top of the spectrum hold nothing
+
+    Args:
+    capacity, int, same capacity for every level (1 for Pauli like filling),
+        "degeneracy", one particle per state so level i holds g_i, or 1d array
+        of ints, one per level, levels past its end hold nothing
+    spec, spectrum, gives the degeneracies
+    n, int, number of levels
+
+    Returns 1d np array of ints
+    """
+
+    # levels that exist
+    m = n if spec.Top() is None else min(n, spec.Top() + 1);
+
+    if( isinstance(capacity, str) ):
+        if( capacity != "degeneracy" ):
+            raise ValueError("capacity must be an int, \"degeneracy\" or an array, not "+capacity);
+        capacity = spec.Degeneracies(m);
+    elif( isinstance(capacity, (int, np.integer)) ):
+        if( capacity < 1 ):
+            raise ValueError("capacity must be at least 1");
+        capacity = np.full(m, capacity, dtype = np.int64);
+
+    capacity = np.asarray(capacity, dtype = np.int64)[:m];
+    return np.concatenate((capacity, np.zeros(n - len(capacity), dtype = np.int64)) ); #### end capacities
+
+
+################################################################################
+# test code / wrapper functions
+################################################################################
+
+def SpectrumTestCode():
+
+    import agent
+    import ladder
+
+    # a few kinds of spectrum
+    for spec in (spectrum("harmonic"), spectrum("quadratic", 0.5),
+        spectrum("uniform", degeneracy = lambda levels: 2*levels + 1),
+        spectrum("table", table = [0, 1, 1.5, 4]) ):
+        print(str(spec)+": E = "+str(spec.Energies(4))+", g = "+str(spec.Degeneracies(4))+", p(T = 1) = "+str(np.round(spec.Boltzmann(1, 4), 3)) );
+
+    # ladder on a harmonic spectrum
+    lad = ladder.ladder(seed = 0, spec = spectrum("harmonic") );
+    lad.Start(agent.population(10, 0.5, 0.4) );
+    for t in range(20):
+        lad.TimeStep();
+    print(lad);
+    print(lad.Energies() );
+
+    return; #### end spectrum test code
+
+
+################################################################################
+# execute code
+################################################################################
+
+if(__name__ == "__main__"):
+
+    SpectrumTestCode();